@@ -1,38 +1,61 @@
-from copy import deepcopy
-from functools import lru_cache
-from glob import glob
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial, update_wrapper
+from itertools import repeat
 import json
+from multiprocessing import get_context
 import os.path
 import re
+from typing import Sequence
 
 from jsonschema import draft7_format_checker
 from jsonschema.validators import RefResolver, validator_for
 
+from ckanfunctionaltests.api import schema_bundle
+from ckanfunctionaltests.api.normalise import PlaceholderTemplate, copy_document
 
-uuid_re = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.I)
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
 
 
-def _get_schema(schema_path: str) -> dict:
-    with open(schema_path, "rb") as f:
-        return json.load(f)
+uuid_re = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.I)
 
 
 _schema_id_base = "http://github.com/alphagov/ckan-functional-tests/api/"
-_schema_store = None
+_schemas_dir = os.path.join(os.path.dirname(__file__), "schemas")
+# a generated artifact holding the parsed schemas and their compiled validators, see schema_bundle. its location can
+# be overridden in the environment, which any validation processes spawned will also see.
+_schema_bundle_path = os.environ.get("CKANFT_SCHEMA_BUNDLE") or schema_bundle.get_default_bundle_path(_schemas_dir)
+_schema_bundle = None
+
+
+def get_schema_bundle() -> dict:
+    "The schema bundle, loaded (or, if stale, rebuilt) the first time it's needed"
+    global _schema_bundle
+    if _schema_bundle is None:
+        _schema_bundle = schema_bundle.get_bundle(
+            _schema_bundle_path,
+            _schemas_dir,
+            _schema_id_base,
+            _get_formats(),
+        )
+    return _schema_bundle
 
 
 def _get_schema_store() -> dict:
-    global _schema_store
-    if _schema_store is None:
-        _schema_store = {
-            _schema_id_base + os.path.basename(
-                ".".join(schema_path.split(".")[:-2])
-            ): _get_schema(schema_path)
-            for schema_path in glob(
-                os.path.join(os.path.dirname(__file__), "schemas", "*.schema.json")
-            )
-        }
-    return _schema_store
+    return get_schema_bundle()["store"]
+
+
+def write_schema_bundle() -> str:
+    "(Re)build the schema bundle from the current schemas, returning its path"
+    global _schema_bundle
+    _schema_bundle = schema_bundle.build_bundle(_schemas_dir, _schema_id_base, _get_formats())
+    schema_bundle.write_bundle(_schema_bundle_path, _schema_bundle)
+    # any projected schemas will need to be derived again in the new store
+    get_projected_schema.cache_clear()
+    return _schema_bundle_path
 
 
 # grab a reference to the checker draft7_format_checker is using by default
@@ -58,6 +81,14 @@ def _is_uuid(instance):
     return bool(isinstance(instance, str) and uuid_re.fullmatch(instance))
 
 
+@lru_cache()
+def _get_formats() -> dict:
+    return {
+        format_name: partial(draft7_format_checker.conforms, format=format_name)
+        for format_name in draft7_format_checker.checkers
+    }
+
+
 @lru_cache()
 def get_validator(schema_name: str):
     store = _get_schema_store()
@@ -69,10 +100,159 @@ def get_validator(schema_name: str):
     )
 
 
+@lru_cache()
+def get_compiled_validator(schema_name: str):
+    """
+    Returns a function validating its argument against the named schema, generated as specialised
+    python code by fastjsonschema with all ``$ref``s resolved ahead of time. Uses the same format
+    checkers as ``get_validator``'s validators. Returns None if fastjsonschema isn't installed.
+
+    The generated code is normally taken precompiled from the schema bundle.
+    """
+    if fastjsonschema is None:
+        return None
+
+    formats = _get_formats()
+    func = schema_bundle.load_validator(get_schema_bundle(), schema_name)
+    if func is None:
+        store = _get_schema_store()
+        return fastjsonschema.compile(
+            store[_schema_id_base + schema_name],
+            handlers={"http": store.__getitem__},
+            formats=formats,
+            use_default=False,
+        )
+
+    return update_wrapper(partial(func, custom_formats=formats), func)
+
+
+def _replace_refs(schema, refs: dict):
+    "A copy of ``schema`` with any ``$ref``s found in ``refs`` replaced by their values"
+    if isinstance(schema, dict):
+        return {
+            key: refs.get(value, value) if key == "$ref" else _replace_refs(value, refs)
+            for key, value in schema.items()
+        }
+    if isinstance(schema, list):
+        return [_replace_refs(value, refs) for value in schema]
+    return schema
+
+
+@lru_cache()
+def get_projected_schema(schema_name: str, item_schema_names: tuple, fields: tuple) -> str:
+    """
+    Derives a variant of the named schema in which every reference to one of ``item_schema_names`` is replaced
+    by a reference to a projection of it, only enforcing its ``properties`` (and ``required``ness) of ``fields``.
+    The derived schemas are added to the schema store, returning the name to validate against.
+    """
+    store = _get_schema_store()
+    suffix = ".projected." + "-".join(fields)
+
+    refs = {}
+    for item_schema_name in item_schema_names:
+        item_schema = store[_schema_id_base + item_schema_name]
+        projected_item_schema = {
+            **item_schema,
+            "$id": _schema_id_base + item_schema_name + suffix + ".schema.json",
+            "properties": {
+                key: value for key, value in item_schema.get("properties", {}).items() if key in fields
+            },
+            "required": [key for key in item_schema.get("required", ()) if key in fields],
+        }
+        store[_schema_id_base + item_schema_name + suffix] = projected_item_schema
+        refs[item_schema_name] = item_schema_name + suffix
+
+    projected_schema = _replace_refs(store[_schema_id_base + schema_name], refs)
+    projected_schema["$id"] = _schema_id_base + schema_name + suffix + ".schema.json"
+    store[_schema_id_base + schema_name + suffix] = projected_schema
+    return schema_name + suffix
+
+
+_fast_validation = True
+
+
+def set_fast_validation(enabled: bool) -> None:
+    "Choose whether validate_against_schema should try a compiled validator first"
+    global _fast_validation
+    _fast_validation = enabled
+
+
 def validate_against_schema(candidate, schema_name: str) -> None:
+    compiled_validator = get_compiled_validator(schema_name) if _fast_validation else None
+    if compiled_validator is not None:
+        try:
+            compiled_validator(candidate)
+        except fastjsonschema.JsonSchemaException:
+            # fall through to jsonschema's validator, which will raise the same ValidationError
+            # we would have raised without the fast path
+            pass
+        else:
+            return
+
     get_validator(schema_name).validate(candidate)
 
 
+ItemValidationError = namedtuple("ItemValidationError", ("index", "path", "message",))
+
+
+def _get_item_errors(item, schema_name: str, fast_validation: bool) -> tuple:
+    compiled_validator = get_compiled_validator(schema_name) if fast_validation else None
+    if compiled_validator is not None:
+        try:
+            compiled_validator(item)
+        except fastjsonschema.JsonSchemaException:
+            # fall through to jsonschema's validator to collect every error in the item
+            pass
+        else:
+            return ()
+
+    return tuple(
+        (tuple(error.absolute_path), error.message,)
+        for error in get_validator(schema_name).iter_errors(item)
+    )
+
+
+def _validate_chunk(items: Sequence, start: int, schema_name: str, fast_validation: bool) -> dict:
+    errors = {}
+    for index, item in enumerate(items, start):
+        item_errors = _get_item_errors(item, schema_name, fast_validation)
+        if item_errors:
+            errors[index] = [ItemValidationError(index, path, message) for path, message in item_errors]
+    return errors
+
+
+def validate_many(
+    items: Sequence,
+    schema_name: str,
+    processes: int = 0,
+    chunk_size: int = 100,
+) -> dict:
+    """
+    Validates each of ``items`` against the named schema, returning a dict of the index of each invalid item
+    to a list of *all* its ``ItemValidationError``s (rather than stopping at the first), so an empty dict means
+    all items are valid.
+
+    Setting ``processes`` above 1 validates ``chunk_size`` items at a time over a pool of that many processes,
+    only worth it for a lot of large items. Fewer items than a single chunk are always validated in-process.
+    """
+    if processes <= 1 or len(items) <= chunk_size:
+        return _validate_chunk(items, 0, schema_name, _fast_validation)
+
+    errors = {}
+    starts = range(0, len(items), chunk_size)
+    # spawned rather than forked processes, as the caller may well have threads of its own
+    with ProcessPoolExecutor(max_workers=processes, mp_context=get_context("spawn")) as executor:
+        for chunk_errors in executor.map(
+            _validate_chunk,
+            (items[start:start + chunk_size] for start in starts),
+            starts,
+            repeat(schema_name),
+            repeat(_fast_validation),
+        ):
+            errors.update(chunk_errors)
+    return errors
+
+
 _all_alpha_re = re.compile(r"[a-z]+", re.I)
 
 
@@ -95,6 +275,12 @@ def _get_example_response_inner(filename: str):
 
 
 def get_example_response(filename: str):
-    # returning a deepcopy allows the caller to mutate the response safely without affecting
-    # cached version
-    return deepcopy(_get_example_response_inner(filename))
+    # returning a deep copy allows the caller to mutate the response safely without affecting
+    # cached version. copy_document only has to recreate the containers of the parsed json.
+    return copy_document(_get_example_response_inner(filename))
+
+
+@lru_cache()
+def get_example_response_template(filename: str) -> PlaceholderTemplate:
+    "The example response along with the indexed locations of its ``<<NAME>>`` placeholders"
+    return PlaceholderTemplate(_get_example_response_inner(filename))
@@ -0,0 +1,206 @@
+from collections import Counter, OrderedDict
+from io import BytesIO
+from threading import Lock
+from time import monotonic, sleep
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from requests import Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.exceptions import HTTPError
+
+
+def normalise_url(url: str, include_host: bool = True) -> str:
+    """
+    Produce a canonical form of ``url`` suitable for use as a key, sorting its query parameters
+    and dropping any fragment
+    """
+    scheme, netloc, path, query, _ = urlsplit(url)
+    return urlunsplit((
+        scheme.lower() if include_host else "",
+        netloc.lower() if include_host else "",
+        path,
+        urlencode(sorted(parse_qsl(query, keep_blank_values=True))),
+        "",
+    ))
+
+
+def build_response(request, status: int, reason: str, headers, body: bytes) -> Response:
+    "Construct a Response for ``request`` from stored details, without any underlying connection"
+    response = Response()
+    response.status_code = status
+    response.reason = reason
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    # presenting the body through ``raw`` rather than pre-filling the content allows
+    # stream=True consumers to work as normal
+    response.raw = BytesIO(body)
+    response.url = request.url
+    response.request = request
+    return response
+
+
+class ObservedRaw:
+    """
+    Wraps a response's ``raw`` body, passing each (decoded) chunk to ``on_chunk`` as it is read
+    by the response's consumer and calling ``on_done`` once the body has been read to the end.
+    Consumers reading with stream=True still receive the body incrementally.
+
+    A consumer may stop reading at the end of the body without making the final, empty read
+    that would reveal it, so when the response is closed or its connection released any
+    remainder is checked for: if there is none ``on_done`` is still called, otherwise the body
+    was abandoned part way through and ``on_abandoned`` is called instead.
+    """
+    def __init__(self, raw, on_chunk, on_done, on_abandoned=None):
+        self._raw = raw
+        self._on_chunk = on_chunk
+        self._on_done = on_done
+        self._on_abandoned = on_abandoned
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def _finish(self):
+        if self._on_done is not None:
+            self._on_done()
+            self._on_done = None
+
+    def _settle(self):
+        if self._on_done is None:
+            return
+        try:
+            remainder = self._raw.read(1)
+        except (HTTPError, OSError, ValueError):
+            # e.g. the connection was lost, in which case we can't know we saw the whole body
+            remainder = True
+        if not remainder:
+            self._finish()
+            return
+        self._on_done = None
+        if self._on_abandoned is not None:
+            self._on_abandoned()
+
+    def close(self):
+        self._settle()
+        return self._raw.close()
+
+    def release_conn(self):
+        self._settle()
+        release_conn = getattr(self._raw, "release_conn", None)
+        if release_conn is not None:
+            return release_conn()
+
+    def read(self, *args, **kwargs):
+        chunk = self._raw.read(*args, **kwargs)
+        if chunk:
+            self._on_chunk(chunk)
+        if not chunk or not (args or kwargs.get("amt")):
+            self._finish()
+        return chunk
+
+    def stream(self, *args, **kwargs):
+        if not hasattr(self._raw, "stream"):
+            # e.g. a stored response's BytesIO
+            amt = args[0] if args else kwargs.get("amt", 2 ** 16)
+            while True:
+                chunk = self.read(amt)
+                if not chunk:
+                    return
+                yield chunk
+
+        for chunk in self._raw.stream(*args, **kwargs):
+            self._on_chunk(chunk)
+            yield chunk
+        self._finish()
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket, allowing bursts of up to ``capacity`` requests but otherwise
+    limiting the sustained rate to ``rate`` requests per second.
+    """
+    def __init__(self, rate: float, capacity: float):
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._last = monotonic()
+        self._lock = Lock()
+
+    def acquire(self) -> float:
+        "Block until a token is available, returning the time spent waiting"
+        with self._lock:
+            now = monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._last) * self._rate)
+            self._last = now
+            # allowing the balance to go negative reserves this caller a place in the queue,
+            # meaning we don't have to hold the lock while sleeping
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.
+        if wait:
+            sleep(wait)
+        return wait
+
+
+class WrappingAdapter(BaseAdapter):
+    "Base for adapters which add behaviour around an ``inner`` adapter, which does the real work"
+    def __init__(self, inner: BaseAdapter):
+        super().__init__()
+        self.inner = inner
+
+    def send(self, request, **kwargs):
+        return self.inner.send(request, **kwargs)
+
+    def close(self):
+        self.inner.close()
+
+
+class RateLimitedAdapter(WrappingAdapter):
+    "Takes a token from ``bucket`` before sending each request"
+    def __init__(self, inner: BaseAdapter, bucket: TokenBucket):
+        super().__init__(inner)
+        self._bucket = bucket
+
+    def send(self, request, **kwargs):
+        self._bucket.acquire()
+        return super().send(request, **kwargs)
+
+
+class CachingAdapter(WrappingAdapter):
+    """
+    Serves repeated GET requests from an in-memory cache of up to ``maxsize`` responses, evicting
+    the least recently used. Streamed requests and server errors are never cached. Hits and
+    misses are counted in ``stats``.
+    """
+    def __init__(self, inner: BaseAdapter, maxsize: int, stats: Counter):
+        super().__init__(inner)
+        self.maxsize = maxsize
+        self.stats = stats
+        self._cache = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def get_key(request):
+        return (request.method, normalise_url(request.url), request.headers.get("authorization"),)
+
+    def send(self, request, **kwargs):
+        if request.method != "GET" or kwargs.get("stream"):
+            return super().send(request, **kwargs)
+
+        key = self.get_key(request)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+            self.stats["response_cache_hits" if entry is not None else "response_cache_misses"] += 1
+        if entry is not None:
+            return build_response(request, *entry)
+
+        response = super().send(request, **kwargs)
+        if response.status_code < 500:
+            entry = (response.status_code, response.reason, dict(response.headers), response.content,)
+            with self._lock:
+                self._cache[key] = entry
+                while len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+        return response
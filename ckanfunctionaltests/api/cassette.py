@@ -0,0 +1,121 @@
+from base64 import b64decode, b64encode
+import gzip
+from hashlib import sha1
+import json
+import os
+import os.path
+from tempfile import NamedTemporaryFile
+from warnings import warn
+
+from requests.adapters import BaseAdapter
+from requests.exceptions import ConnectionError
+
+from ckanfunctionaltests.api.adapters import ObservedRaw, WrappingAdapter, build_response, normalise_url
+
+
+class CassetteMiss(ConnectionError):
+    "Raised when replaying a request which doesn't appear in the cassette"
+
+
+# these describe the transfer of the original response rather than the content we store
+_dropped_headers = frozenset(("content-encoding", "content-length", "transfer-encoding", "connection",))
+
+
+class CassetteStore:
+    """
+    An on-disk store of responses, keyed by request method & normalised url. Each entry is kept
+    in its own gzipped file, so that parallel workers can safely record into the same store.
+
+    The scheme and host are not included in the key, allowing responses recorded from one
+    instance to be replayed with ``api_base_url`` pointing somewhere else.
+    """
+    def __init__(self, path: str):
+        self.path = path
+
+    @staticmethod
+    def get_key(request) -> str:
+        return f"{request.method} {normalise_url(request.url, include_host=False)}"
+
+    def _get_entry_path(self, key: str) -> str:
+        return os.path.join(self.path, sha1(key.encode("utf-8")).hexdigest() + ".json.gz")
+
+    def get(self, key: str):
+        try:
+            with gzip.open(self._get_entry_path(key), "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+
+        entry["body"] = (
+            b64decode(entry["body"]) if entry.pop("b64", False) else entry["body"].encode("utf-8")
+        )
+        return entry
+
+    def put(self, key: str, response, content: bytes) -> None:
+        "Store ``response`` under ``key``, its body being ``content``"
+        try:
+            body, b64 = content.decode("utf-8"), False
+        except UnicodeDecodeError:
+            body, b64 = b64encode(content).decode("ascii"), True
+
+        entry = {
+            "key": key,
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": {
+                k: v for k, v in response.headers.items() if k.lower() not in _dropped_headers
+            },
+            "body": body,
+            "b64": b64,
+        }
+
+        os.makedirs(self.path, exist_ok=True)
+        # write to a temporary file first so a reader never sees a partially written entry
+        with NamedTemporaryFile(dir=self.path, suffix=".tmp", delete=False) as f:
+            with gzip.open(f, "wt", encoding="utf-8") as gzf:
+                json.dump(entry, gzf, separators=(",", ":",))
+        os.replace(f.name, self._get_entry_path(key))
+
+
+class CassetteAdapter(WrappingAdapter):
+    """
+    In "record" mode, passes requests through to the ``inner`` adapter, storing each response
+    received. The body is copied into the store as it is read by the response's consumer, so
+    streamed responses are still streamed, but are only stored once read to the end, a warning
+    being emitted for any closed before then. In "replay" mode, serves responses solely from the
+    store, never touching the network.
+    """
+    modes = ("record", "replay",)
+
+    def __init__(self, inner: BaseAdapter, store: CassetteStore, mode: str):
+        if mode not in self.modes:
+            raise ValueError(f"Unknown cassette mode {mode!r}")
+        super().__init__(inner)
+        self.store = store
+        self.mode = mode
+
+    def send(self, request, **kwargs):
+        key = self.store.get_key(request)
+
+        if self.mode == "replay":
+            entry = self.store.get(key)
+            if entry is None:
+                raise CassetteMiss(f"No recorded response for {key!r}", request=request)
+            return build_response(
+                request,
+                entry["status"],
+                entry["reason"],
+                entry["headers"],
+                entry["body"],
+            )
+
+        response = super().send(request, **kwargs)
+        chunks = []
+        response.raw = ObservedRaw(
+            response.raw,
+            chunks.append,
+            lambda: self.store.put(key, response, b"".join(chunks)),
+            # otherwise the gap in the recording would only be found when it was replayed
+            lambda: warn(f"Not recording {key!r}: its body wasn't read to the end"),
+        )
+        return response
@@ -1,7 +1,12 @@
+from collections import Counter, OrderedDict, deque, namedtuple
 from collections.abc import Mapping, Sequence
+from copy import deepcopy
 from functools import lru_cache
-from numbers import Number
+from hashlib import blake2b
+import json
 import re
+import reprlib
+import threading
 from types import MappingProxyType
 from typing.re import Pattern
 
@@ -18,11 +23,18 @@ class RestrictedAny:
     True
     >>> (4, 9, 6,) == (4, RestrictedAny(lambda x: x % 2), 6,)
     True
+
+    Subclasses implement their comparison by overriding ``_is_equal`` rather than supplying a ``condition``.
     """
+    __slots__ = ("_condition",)
+
     def __init__(self, condition):
         self._condition = condition
 
     def __eq__(self, other):
+        return self._is_equal(other)
+
+    def _is_equal(self, other):
         return self._condition(other)
 
     def __repr__(self):
@@ -32,21 +44,134 @@ class RestrictedAny:
         return None
 
 
+# types which can be dispatched on without resorting to (relatively slow) abstract base class checks
+_plain_scalar_types = frozenset((str, int, float, bool, type(None),))
+_plain_mapping_types = frozenset((dict,))
+_plain_seq_types = frozenset((list, tuple,))
+
+
 class AnySupersetOf(RestrictedAny):
-    def __new__(cls, subset, recursive=False, seq_norm_order=False):
-        if isinstance(subset, Mapping):
-            return AnySupersetOfMapping(subset, recursive=recursive, seq_norm_order=seq_norm_order)
-        elif isinstance(subset, Sequence) and not isinstance(subset, (str, bytes)):
-            return AnySupersetOfSeq(subset, recursive=recursive, seq_norm_order=seq_norm_order)
+    __slots__ = ()
+
+    def __new__(cls, subset, recursive=False, seq_norm_order=False, parent_key=None):
+        # only allocate the instance here - being an instance of cls, python will go on to call its __init__ with
+        # these same arguments
+        subset_type = type(subset)
+        if subset_type in _plain_scalar_types:
+            return subset
+        elif subset_type in _plain_mapping_types or isinstance(subset, Mapping):
+            return object.__new__(AnySupersetOfMapping)
+        elif subset_type in _plain_seq_types or (isinstance(subset, Sequence) and not isinstance(subset, (str, bytes))):
+            return object.__new__(AnySupersetOfSeq)
         else:
             return subset
 
 
+Mismatch = namedtuple("Mismatch", ("path", "reason", "expected", "actual",))
+
+
+class _Missing:
+    def __repr__(self):
+        return "<missing>"
+
+
+_missing = _Missing()
+
+
+def format_path(path):
+    """
+    Format a path of mapping keys & sequence indices as an expression-like string
+
+    >>> format_path(("resources", 3, "format",))
+    'resources[3].format'
+    """
+    formatted = ""
+    for k in path:
+        if isinstance(k, int):
+            formatted += f"[{k}]"
+        elif isinstance(k, str) and k.isidentifier():
+            formatted += f".{k}" if formatted else k
+        else:
+            formatted += f"[{k!r}]"
+    return formatted or "(top level)"
+
+
+_mismatch_repr = reprlib.Repr()
+_mismatch_repr.maxstring = _mismatch_repr.maxother = 120
+_mismatch_repr.maxlevel = 2
+
+
+# counts of nested AnySupersetOf comparisons performed and of those avoided by reusing a
+# previous result from the same top-level comparison
+comparison_stats = Counter()
+
+_comparison_state = threading.local()
+
+
 class AnySupersetOfImpl(AnySupersetOf):
-    "This class simply exists to reset the __new__ method for any AnySupersetOf implementations"
+    """
+    This class mostly exists to reset the __new__ method for any AnySupersetOf implementations. Following a failed
+    comparison, ``mismatch`` will describe the first point found at which the compared object differed, allowing it to
+    be reported without having to repr or diff the whole of both structures.
+
+    For the duration of a top-level comparison, the result of comparing any nested matcher with a particular object is
+    remembered, so that no such comparison is performed more than once.
+    """
+    __slots__ = ("mismatch",)
+
     def __new__(cls, *args, **kwargs):
         return object.__new__(cls)
 
+    def __init__(self):
+        self.mismatch = None
+
+    def __eq__(self, other):
+        memo = getattr(_comparison_state, "memo", None)
+        if memo is None:
+            _comparison_state.memo, _comparison_state.indices = {}, {}
+            try:
+                return self._is_equal(other)
+            finally:
+                _comparison_state.memo = _comparison_state.indices = None
+
+        key = (id(self), id(other),)
+        if key in memo:
+            comparison_stats["comparisons_memoised"] += 1
+            # other is only held to ensure its id can't be reused by another object
+            _other, result, self.mismatch = memo[key]
+            return result
+
+        comparison_stats["comparisons"] += 1
+        result = self._is_equal(other)
+        memo[key] = (other, result, self.mismatch,)
+        return result
+
+    def _mismatched(self, key, reason, expected, actual):
+        "Record a mismatch at ``key``, or at this level if None"
+        return self._mismatched_at(() if key is None else (key,), reason, expected, actual)
+
+    def _mismatched_at(self, path, reason, expected, actual):
+        "Record a mismatch at ``path``, descending into ``expected``'s own mismatch if it was a matcher found unequal"
+        if reason == "not equal" and isinstance(expected, AnySupersetOfImpl) and expected.mismatch is not None:
+            self.mismatch = expected.mismatch._replace(path=path + expected.mismatch.path)
+        else:
+            self.mismatch = Mismatch(path, reason, expected, actual)
+        return False
+
+    def _matched(self):
+        self.mismatch = None
+        return True
+
+    def describe_mismatch(self):
+        "Return a compact description of the last mismatch as a list of lines, or None if the last comparison matched"
+        if self.mismatch is None:
+            return None
+        return [
+            f"mismatch at {format_path(self.mismatch.path)}: {self.mismatch.reason}",
+            f"  expected: {_mismatch_repr.repr(self.mismatch.expected)}",
+            f"  actual: {_mismatch_repr.repr(self.mismatch.actual)}",
+        ]
+
 
 class AnySupersetOfMapping(AnySupersetOfImpl):
     """
@@ -63,21 +188,167 @@ class AnySupersetOfMapping(AnySupersetOfImpl):
     The ``seq_norm_order`` flag only applies to any recursively-discovered child sequences, and therefore has no
     meaning without ``recursive=True``.
     """
-    def __init__(self, subset_dict, recursive=False, seq_norm_order=False):
+    __slots__ = ("_subset_dict",)
+
+    def __init__(self, subset_dict, recursive=False, seq_norm_order=False, parent_key=None):
         # take an immutable dict copy of supplied dict-like object
         self._subset_dict = MappingProxyType({
-            k: AnySupersetOf(v, recursive=recursive, seq_norm_order=seq_norm_order) if recursive else v
+            k: AnySupersetOf(v, recursive=recursive, seq_norm_order=seq_norm_order, parent_key=k) if recursive else v
             for k, v in subset_dict.items()
         })
-        super().__init__(lambda other: (
-            isinstance(other, Mapping)
-            and self._subset_dict == {k: v for k, v in other.items() if k in self._subset_dict}
-        ))
+        super().__init__()
+
+    def _is_equal(self, other):
+        if not isinstance(other, Mapping):
+            return self._mismatched(None, "not a mapping", "a mapping", other)
+
+        for k, v in self._subset_dict.items():
+            if k not in other:
+                return self._mismatched(k, "missing key", v, _missing)
+            if not (v is other[k] or v == other[k]):
+                return self._mismatched(k, "not equal", v, other[k])
+
+        return self._matched()
 
     def __repr__(self):
         return f"{self.__class__.__name__}({self._subset_dict})"
 
 
+def _is_seq(value):
+    value_type = type(value)
+    if value_type in _plain_seq_types:
+        return True
+    if value_type in _plain_scalar_types or value_type in _plain_mapping_types:
+        return False
+    return isinstance(value, Sequence) and not isinstance(value, (str, bytes))
+
+
+class _SupersetIndex:
+    """
+    Indices of the items of a superset sequence, bucketed (lazily, once per kind of key) by the hashable keys
+    produced by ``AnySupersetOfSeq.get_match_key``, always plain scalars. Items which can't be bucketed but *could*
+    still be equal to an item with a given key (such as a RestrictedAny) are returned as candidates for every key of
+    that kind.
+    """
+    __slots__ = ("_items", "_buckets", "_wildcards",)
+
+    def __init__(self, items):
+        self._items = items
+        self._buckets = {}
+        self._wildcards = {}
+
+    @classmethod
+    def for_items(cls, items):
+        "Return an index of ``items``, shared with any other users of the same sequence within a top-level comparison"
+        indices = getattr(_comparison_state, "indices", None)
+        if indices is None:
+            return cls(items)
+
+        index = indices.get(id(items))
+        if index is None:
+            index = indices[id(items)] = cls(items)
+        else:
+            comparison_stats["superset_indices_reused"] += 1
+        return index
+
+    def _build(self, field):
+        buckets, wildcards = {}, []
+        for i, item in enumerate(self._items):
+            if field is None:
+                value = item
+            elif type(item) in _plain_mapping_types or isinstance(item, Mapping):
+                if field not in item:
+                    continue
+                value = item[field]
+            else:
+                # only something with "funny" equality properties could equal a mapping
+                if type(item) not in _plain_scalar_types and not _is_seq(item):
+                    wildcards.append(i)
+                continue
+
+            # keys are only ever scalars, which mappings & sequences can't equal
+            if type(value) in _plain_scalar_types:
+                buckets.setdefault(value, []).append(i)
+            elif not (type(value) in _plain_mapping_types or isinstance(value, Mapping) or _is_seq(value)):
+                # something with "funny" equality properties
+                wildcards.append(i)
+
+        self._buckets[field], self._wildcards[field] = buckets, wildcards
+
+    def get_candidates(self, match_key):
+        "Ascending indices of items which could possibly be equal to an item with ``match_key``"
+        if match_key is None:
+            comparison_stats["match_key_unconstrained"] += 1
+            return range(len(self._items))
+
+        field, value = match_key
+        comparison_stats[f"match_key_{field or 'value'}"] += 1
+        if field not in self._buckets:
+            self._build(field)
+
+        bucket = self._buckets[field].get(value, ())
+        wildcards = self._wildcards[field]
+        return sorted((*bucket, *wildcards)) if wildcards else bucket
+
+
+def _complete_matching(adjacency, match_sub, match_super):
+    """
+    Extend the partial matching between subset and superset items described by ``match_sub`` & ``match_super``
+    to a maximum matching using the Hopcroft-Karp algorithm, returning whether every subset item could be matched.
+    ``adjacency`` holds, for each subset item, the indices of the superset items it equals.
+    """
+    unreachable = float("inf")
+    while True:
+        # breadth-first search for the shortest augmenting paths from the unmatched subset items
+        distances = {i: 0 for i, j in enumerate(match_sub) if j is None}
+        queue = deque(distances)
+        found_augmenting_path = False
+        while queue:
+            i = queue.popleft()
+            for j in adjacency[i]:
+                next_i = match_super.get(j)
+                if next_i is None:
+                    found_augmenting_path = True
+                elif next_i not in distances:
+                    distances[next_i] = distances[i] + 1
+                    queue.append(next_i)
+
+        if not found_augmenting_path:
+            return all(j is not None for j in match_sub)
+
+        def augment(root_i):
+            # depth-first search along the layers found for an augmenting path from ``root_i``, done with an explicit
+            # stack as the path can be as long as the largest bucket. ``path`` holds the subset items being explored,
+            # each with its remaining candidates, and ``path_supers`` the superset item by which each after the first
+            # was reached.
+            path = [(root_i, iter(adjacency[root_i]))]
+            path_supers = []
+            while path:
+                i, candidates = path[-1]
+                for j in candidates:
+                    next_i = match_super.get(j)
+                    if next_i is None:
+                        # an augmenting path - flip every pairing along it
+                        for (path_i, _), path_j in zip(path, path_supers + [j]):
+                            match_sub[path_i], match_super[path_j] = path_j, path_i
+                        return True
+                    if distances.get(next_i) == distances[i] + 1:
+                        path.append((next_i, iter(adjacency[next_i])))
+                        path_supers.append(j)
+                        break
+                else:
+                    # no augmenting path through this item
+                    distances[i] = unreachable
+                    path.pop()
+                    if path_supers:
+                        path_supers.pop()
+            return False
+
+        for i, j in enumerate(match_sub):
+            if j is None:
+                augment(i)
+
+
 class AnySupersetOfSeq(AnySupersetOfImpl):
     """
     Instance will appear to "equal" any sequence that is a "superset" of the constructor-supplied ``subset_seq``,
@@ -90,97 +361,276 @@ class AnySupersetOfSeq(AnySupersetOfImpl):
     If constructed with the ``recursive`` option, this fuzzy equality behaviour will also be applied to any contained
     Sequence or any contained Mapping (using AnySupersetOfMapping), applied recursively.
 
-    If constructed with the ``seq_norm_order`` option, will attempt to compare sequences in an order-insensitive way.
-    This is done by sorting both sides of the comparison using the ``get_norm_order_key`` method as a key function. The
-    default implementation of this looks for likely-stable, identifying keys in any child mappings it finds. It is not
-    faultless as I realized that doing order-insensitive superset testing "perfectly" is equivalent to solving a
-    bipartite graph matching problem, which is NP-complete. So this will have to do. Remember, we can't "just use sets"
-    becuase it's likely the elements aren't hashable.
+    If constructed with the ``seq_norm_order`` option, will compare sequences in an order-insensitive way, each item
+    of ``subset_seq`` having to equal a different item of the sequence in question. This is a bipartite matching
+    problem. To avoid comparing every pair of items, the superset's items are bucketed by the key returned by
+    ``get_match_key``, which looks for likely-stable, identifying keys in any child mappings it finds, so that each
+    subset item need only be compared against those in its own bucket. A greedy matching is attempted first, only
+    falling back to a full (Hopcroft-Karp) matching if that leaves any subset items unmatched. Remember, we can't
+    "just use sets" becuase it's likely the elements aren't hashable.
     """
-    def __init__(self, subset_seq, recursive=False, seq_norm_order=False):
+    __slots__ = ("_seq_norm_order", "_match_keys", "_subset_seq",)
+
+    def __init__(self, subset_seq, recursive=False, seq_norm_order=False, parent_key=None):
         self._seq_norm_order = seq_norm_order
-        if self._seq_norm_order:
-            subset_seq = tuple(sorted(subset_seq, key=self.get_norm_order_key))
+        # keys have to be taken from the original items as they may be about to be wrapped
+        self._match_keys = tuple(
+            self.get_match_key(v, self.match_fields_by_parent.get(parent_key))
+            for v in subset_seq
+        ) if seq_norm_order else None
         self._subset_seq = tuple(
-            (AnySupersetOf(v, recursive=recursive, seq_norm_order=seq_norm_order) if recursive else v)
+            (self._item_matcher(v, recursive=recursive, seq_norm_order=seq_norm_order) if recursive else v)
             for v in subset_seq
         )
-        super().__init__(self._is_equal)
+        super().__init__()
+
+    # used to construct matchers for child items when recursive
+    _item_matcher = AnySupersetOf
 
     def _is_equal(self, other):
-        if not (isinstance(other, Sequence) and not isinstance(other, (str, bytes))):
-            return False
+        if not _is_seq(other):
+            return self._mismatched(None, "not a sequence", "a sequence", other)
+
+        if self._seq_norm_order:
+            return self._is_equal_unordered(other)
 
         # this technique should work as long as `other` (the superset sequence doesn't have
         # any items with "funny" equality properties (like, say, another RestrictedAny)
         # because we don't perform any backtracking. we just attempt to do a parallel
         # iteration of the two sequences and see which one runs out first
-        sub_iter = iter(self._subset_seq)
+        sub_iter = enumerate(self._subset_seq)
         try:
-            current_sub = next(sub_iter)
+            i, current_sub = next(sub_iter)
         except StopIteration:
             # an empty sequence is a subsequence of anything
-            return True
-
-        if self._seq_norm_order:
-            other = sorted(other, key=self.get_norm_order_key)
+            return self._matched()
 
         for current_super in other:
             if current_sub == current_super:
                 # excellent, we can continue advancing both iterators and assume any super
                 # items we had skipped were superfluous
                 try:
-                    current_sub = next(sub_iter)
+                    i, current_sub = next(sub_iter)
                 except StopIteration:
                     # we've run out of items in the sub_iter, any items remaining in the super
                     # seq can be ignored
-                    return True
+                    return self._matched()
             # else we simply advance the super iterator to see if *its* next item equals
             # current_sub
         else:
             # not all items in sub_iter were matched
-            return False
+            return self._mismatched(None, f"nothing (in order) equal to expected item {i}", current_sub, other)
+
+    def _is_equal_unordered(self, other):
+        if len(self._subset_seq) > len(other):
+            return self._mismatched(
+                None,
+                f"expected at least {len(self._subset_seq)} items, found {len(other)}",
+                self._subset_seq,
+                other,
+            )
+
+        index = _SupersetIndex.for_items(other)
+        match_sub = [None] * len(self._subset_seq)
+        match_super = {}
+        known_unequal = set()
+
+        # greedily match each subset item with the first equal, unmatched superset item, which
+        # will usually be enough
+        for i, (sub, match_key) in enumerate(zip(self._subset_seq, self._match_keys)):
+            for j in index.get_candidates(match_key):
+                if j in match_super:
+                    continue
+                if sub == other[j]:
+                    match_sub[i], match_super[j] = j, i
+                    break
+                known_unequal.add((i, j))
+
+        if all(j is not None for j in match_sub):
+            return self._matched()
+
+        # the greedy choices may have been wrong - we'll need to find all possible pairings
+        adjacency = []
+        for i, (sub, match_key) in enumerate(zip(self._subset_seq, self._match_keys)):
+            adjacency.append(tuple(
+                j for j in index.get_candidates(match_key)
+                if j == match_sub[i] or ((i, j) not in known_unequal and sub == other[j])
+            ))
+            if not adjacency[-1]:
+                # this item doesn't equal anything
+                return self._mismatched_unordered(i, index, other)
+
+        if _complete_matching(adjacency, match_sub, match_super):
+            return self._matched()
+        return self._mismatched_unordered(match_sub.index(None), index, other)
+
+    def _mismatched_unordered(self, i, index, other):
+        candidates = index.get_candidates(self._match_keys[i]) if self._match_keys[i] is not None else ()
+        if len(candidates) == 1:
+            # there was only one item this could have been intended to match - compare it again to find out where
+            # it differs
+            j, = candidates
+            if not self._subset_seq[i] == other[j]:
+                return self._mismatched(j, "not equal", self._subset_seq[i], other[j])
+        return self._mismatched(None, f"nothing distinct equal to expected item {i}", self._subset_seq[i], other)
 
     norm_order_mapping_keys = ("key", "name", "position",)
-    norm_order_stringifiable_types = (str, bytes, bool, Number,)
+
+    # mapping keys to try in preference to ``norm_order_mapping_keys`` for the items of sequences found under
+    # particular keys of a parent mapping, chosen to be as close to unique among their siblings as possible. any
+    # choice is *correct*, as equal items must share the value of any key holding a plain scalar (other values, such
+    # as sequences, can be compared as supersets so are never used), but a less discriminating one will leave more
+    # candidates to be compared
+    match_fields_by_parent = {
+        "resources": ("position", "name",),
+        "extras": ("key",),
+        "tags": ("name",),
+        "groups": ("name",),
+    }
 
     @classmethod
-    def get_norm_order_key(cls, item):
-        # all return values must be tuples of the form (int, str?) (the string being optional) to ensure their
-        # comparability. the leading integer denotes which "category" of key this is. this is done so that keys
-        # retrieved by different means end up segregated once sorted.
-        key_categories_skipped = 0
+    def get_match_key(cls, item, fields=None):
+        """
+        Return a hashable key which any item equal to ``item`` would also produce from its own bucketing, as a tuple
+        of (field, value), where field is None for a scalar ``item`` itself used as the value, or None if no such key
+        can be determined. For mappings, the first of ``fields`` (defaulting to ``norm_order_mapping_keys``) with a
+        plain scalar value is used. Values of any other type could be compared as supersets (a sequence equalling a
+        longer one) or have otherwise "funny" equality, so aren't used.
+        """
+        if type(item) in _plain_scalar_types:
+            return (None, item)
         if isinstance(item, Mapping):
             return next(
                 (
-                    (i, str(item[k]))
-                    for i, k in enumerate(cls.norm_order_mapping_keys, key_categories_skipped)
-                    if k in item
+                    (k, item[k])
+                    for k in (fields or cls.norm_order_mapping_keys)
+                    if k in item and type(item[k]) in _plain_scalar_types
                 ),
-                # for mappings with no matched keys
-                (key_categories_skipped + len(cls.norm_order_mapping_keys),),
+                None,
             )
-
-        key_categories_skipped += len(cls.norm_order_mapping_keys) + 1
-
-        return next(
-            (
-                (i, str(item))
-                for i, _type in enumerate(cls.norm_order_stringifiable_types, key_categories_skipped)
-                if isinstance(item, _type)
-            ),
-            # if the item is a more complex type than any of these, it's less likely it will have a stable string
-            # representation (consider e.g. order of items in a dict which doesn't affect equality).
-            # it's tempting to return a string representation of the item as a final effort, but it's better to return a
-            # constant and hopefully allow the stability of the sorting algorithm keep all such items in their
-            # originally returned order
-            (key_categories_skipped + len(cls.norm_order_stringifiable_types),),
-        )
+        return None
 
     def __repr__(self):
         return f"{self.__class__.__name__}({self._subset_seq})"
 
 
+_MAPPING, _EQUAL = range(2)
+
+
+def _canonical_digest(value):
+    """
+    A digest of JSON-like ``value`` which is insensitive to the order of mapping keys, or None if ``value`` contains
+    anything (such as a RestrictedAny or a non-string mapping key) which can't be faithfully represented as JSON
+    """
+    def check(value):
+        if isinstance(value, Mapping):
+            return all(isinstance(k, str) and check(v) for k, v in value.items())
+        if _is_seq(value):
+            return all(check(v) for v in value)
+        return value is None or isinstance(value, (str, int, float,))
+
+    if not check(value):
+        return None
+    return blake2b(json.dumps(value, sort_keys=True).encode("utf-8"), digest_size=16).digest()
+
+
+class AnySupersetOfPlan(AnySupersetOfImpl):
+    """
+    Behaves as the equivalent ``AnySupersetOf``, but nested mappings of ``expected`` are compiled into a flat sequence
+    of instructions, each locating a value by its path from the root of the compared object and checking it, which are
+    applied in a single loop rather than through a recursive chain of matchers. Sequences are still compared using
+    AnySupersetOfSeq, any mappings within them being compiled into their own plans.
+
+    Plans for JSON-like ``expected`` values are cached, so constructing one again for an equal document (such as the
+    same stable fixture in a different test) is cheap.
+
+    >>> {"a": {"b": 1, "c": [2, 3]}, "d": 4} == AnySupersetOfPlan({"a": {"c": [3]}}, recursive=True)
+    True
+    """
+    __slots__ = ("_expected", "_instructions",)
+
+    _cache = OrderedDict()
+    _cache_maxsize = 64
+
+    def __new__(cls, expected, recursive=False, seq_norm_order=False):
+        digest = _canonical_digest([expected, recursive, seq_norm_order])
+        plan = cls._cache.get(digest) if digest is not None else None
+        if plan is None:
+            # the plan mustn't be affected by any later changes to expected
+            plan = cls._build(deepcopy(expected), recursive, seq_norm_order)
+            if digest is not None:
+                cls._cache[digest] = plan
+                if len(cls._cache) > cls._cache_maxsize:
+                    cls._cache.popitem(last=False)
+        else:
+            cls._cache.move_to_end(digest)
+        return plan
+
+    def __init__(self, *args, **kwargs):
+        # all construction is done in __new__ so that cached plans can be returned
+        pass
+
+    @classmethod
+    def _build(cls, expected, recursive=False, seq_norm_order=False):
+        plan = object.__new__(cls)
+        plan._expected = expected
+        plan._instructions = tuple(plan._compile(expected, (), None, None, recursive, seq_norm_order))
+        AnySupersetOfImpl.__init__(plan)
+        return plan
+
+    def _compile(self, expected, path, parent_path, key, recursive, seq_norm_order):
+        # instructions are emitted depth-first, so a mapping's own instruction always precedes those of its members
+        if isinstance(expected, Mapping) and (recursive or not path):
+            yield (path, parent_path, key, _MAPPING, expected,)
+            for k, v in expected.items():
+                yield from self._compile(v, path + (k,), path, k, recursive, seq_norm_order)
+        elif _is_seq(expected) and (recursive or not path):
+            yield (path, parent_path, key, _EQUAL, _PlanSeq(
+                expected,
+                recursive=recursive,
+                seq_norm_order=seq_norm_order,
+                parent_key=key,
+            ),)
+        else:
+            yield (path, parent_path, key, _EQUAL, expected,)
+
+    def _is_equal(self, other):
+        mappings = {}
+        for path, parent_path, key, op, expected in self._instructions:
+            if parent_path is None:
+                value = other
+            else:
+                parent = mappings[parent_path]
+                if key not in parent:
+                    return self._mismatched_at(path, "missing key", expected, _missing)
+                value = parent[key]
+
+            if op is _MAPPING:
+                if not isinstance(value, Mapping):
+                    return self._mismatched_at(path, "not a mapping", "a mapping", value)
+                mappings[path] = value
+            elif not (expected is value or expected == value):
+                return self._mismatched_at(path, "not equal", expected, value)
+
+        return self._matched()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self._expected})"
+
+
+class _PlanSeq(AnySupersetOfSeq):
+    "An AnySupersetOfSeq whose child mappings are compiled into AnySupersetOfPlans"
+    __slots__ = ()
+
+    @staticmethod
+    def _item_matcher(v, recursive=False, seq_norm_order=False, parent_key=None):
+        if isinstance(v, Mapping):
+            return AnySupersetOfPlan._build(v, recursive, seq_norm_order)
+        if _is_seq(v):
+            return _PlanSeq(v, recursive=recursive, seq_norm_order=seq_norm_order)
+        return v
+
+
 class AnyStringMatching(RestrictedAny):
     """
     Instance will appear to "equal" any string that matches the constructor-supplied regex pattern
@@ -188,6 +638,8 @@ class AnyStringMatching(RestrictedAny):
     >>> {"a": "Metempsychosis", "b": "c"} == {"a": AnyStringMatching(r"m+.+psycho.*", flags=re.I), "b": "c"}
     True
     """
+    __slots__ = ("_regex",)
+
     _cached_re_compile = staticmethod(lru_cache(maxsize=32)(re.compile))
 
     def __init__(self, *args, **kwargs):
@@ -200,7 +652,9 @@ class AnyStringMatching(RestrictedAny):
             if len(args) == 1 and isinstance(args[0], Pattern)
             else self._cached_re_compile(*args, **kwargs)
         )
-        super().__init__(lambda other: isinstance(other, (str, bytes)) and bool(self._regex.match(other)))
+
+    def _is_equal(self, other):
+        return isinstance(other, (str, bytes)) and bool(self._regex.match(other))
 
     def __repr__(self):
         return f"{self.__class__.__name__}({self._regex})"
@@ -216,9 +670,91 @@ class ExactIdentity(RestrictedAny):
     >>> (7, ExactIdentity(x),) == (7, [],)
     False
     """
+    __slots__ = ("_reference_object",)
+
     def __init__(self, reference_object):
         self._reference_object = reference_object
-        super().__init__(lambda other: self._reference_object is other)
+
+    def _is_equal(self, other):
+        return self._reference_object is other
 
     def __repr__(self):
         return f"{self.__class__.__name__}({self._reference_object!r} @ {hex(id(self._reference_object))})"
+
+
+def _find_difference(expected, actual, path=()):
+    "A Mismatch describing the first difference found between unequal plain values ``expected`` and ``actual``"
+    if isinstance(expected, Mapping) and isinstance(actual, Mapping):
+        for k in expected:
+            if k not in actual:
+                return Mismatch(path + (k,), "missing key", expected[k], _missing)
+        for k in actual:
+            if k not in expected:
+                return Mismatch(path + (k,), "unexpected key", _missing, actual[k])
+        for k, v in expected.items():
+            if not v == actual[k]:
+                return _find_difference(v, actual[k], path + (k,))
+    elif _is_seq(expected) and _is_seq(actual) and len(expected) == len(actual):
+        for i, (expected_item, actual_item) in enumerate(zip(expected, actual)):
+            if not expected_item == actual_item:
+                return _find_difference(expected_item, actual_item, path + (i,))
+    return Mismatch(path, "not equal", expected, actual)
+
+
+def _get_expected_mapping(expected):
+    if isinstance(expected, AnySupersetOfMapping):
+        return expected._subset_dict
+    if isinstance(expected, AnySupersetOfPlan):
+        return expected._expected if isinstance(expected._expected, Mapping) else None
+    if isinstance(expected, Mapping):
+        return expected
+    return None
+
+
+class MatchResult(namedtuple("MatchResult", ("indices", "near_misses",))):
+    """
+    The result of ``find_matches``: ``indices`` of the items found equal, and ``near_misses``, a mapping of the index of
+    each item which shared all its indexed keys with the expected value but was not equal, to a Mismatch describing why
+    """
+    __slots__ = ()
+
+    def describe_near_misses(self):
+        return [
+            f"item {i}: mismatch at {format_path(mismatch.path)}: {mismatch.reason} "
+            f"(expected {_mismatch_repr.repr(mismatch.expected)}, actual {_mismatch_repr.repr(mismatch.actual)})"
+            for i, mismatch in self.near_misses.items()
+        ] or ["no items shared the expected value's indexed keys"]
+
+
+def find_matches(expected, items, index_keys=("id", "name",)):
+    """
+    Compare ``expected`` (either a plain value or a matcher such as AnySupersetOf) with each of ``items``, returning a
+    MatchResult. Rather than performing a full comparison with every item, items are first filtered on the values of
+    any of ``index_keys`` that ``expected`` specifies as plain scalars, which is usually enough to narrow them down to
+    the one or two which are worth comparing. Those that then turn out not to be equal are reported as near misses.
+
+    >>> find_matches({"name": "b", "x": 1}, [{"name": "a", "x": 1}, {"name": "b", "x": 1}, {"name": "b", "x": 2}])
+    MatchResult(indices=(1,), near_misses={2: Mismatch(path=('x',), reason='not equal', expected=1, actual=2)})
+    """
+    expected_mapping = _get_expected_mapping(expected)
+    index_values = tuple(
+        (k, expected_mapping[k],)
+        for k in index_keys
+        if k in expected_mapping and type(expected_mapping[k]) in _plain_scalar_types
+    ) if expected_mapping is not None else ()
+
+    indices, near_misses = [], {}
+    for i, item in enumerate(items):
+        if index_values and not (
+            isinstance(item, Mapping) and all(k in item and item[k] == v for k, v in index_values)
+        ):
+            continue
+
+        if expected == item:
+            indices.append(i)
+        elif isinstance(expected, AnySupersetOfImpl):
+            near_misses[i] = expected.mismatch
+        else:
+            near_misses[i] = _find_difference(expected, item)
+
+    return MatchResult(tuple(indices), near_misses)
@@ -1,28 +1,282 @@
-from collections.abc import Mapping, Sequence
+from collections import Counter
 from functools import wraps
-import json
 import os.path
 from random import Random
+from warnings import warn
 
 import pytest
-import requests
 
 
-from ckanfunctionaltests.api import get_example_response, uuid_re
+from ckanfunctionaltests.api import (
+    get_example_response,
+    get_example_response_template,
+    get_schema_bundle,
+    set_fast_validation,
+)
+from ckanfunctionaltests.api.adapters import CachingAdapter
+from ckanfunctionaltests.api.comparisons import AnySupersetOfImpl, comparison_stats
+from ckanfunctionaltests.api.latency import LatencyRecorder, check_latency_budgets, parse_latency_budgets
+from ckanfunctionaltests.api.normalise import NormalisationRules, copy_document, normalise
+from ckanfunctionaltests.api.pools import get_harvestobject_id_pool, get_pkg_slug_pool, get_test_random
+from ckanfunctionaltests.api.session import AsyncSession, make_adapter, new_session
+
+
+# counters accumulated over the run. when running in parallel these are sent from each worker
+# to the controlling process to be reported there.
+_run_stats = Counter()
+# likewise the timings of every request made to the target instance, the path of the report
+# to write them to, the configured budgets to check them against and whether exceeding them
+# should fail the run
+_latency_recorder = LatencyRecorder()
+_latency_report_path = None
+_latency_budgets_config = {}
+_fail_latency_budgets = False
+# the budgets exceeded over the whole run, found by the controlling process at the end
+_latency_budget_violations = []
+# whether this process is recording latency at all, and the point in _latency_recorder's samples
+# at which each running test marked latency_budget started, by nodeid
+_record_latency = False
+_latency_checkpoints = {}
+
+
+# the seed used if random_seed isn't set in the variables. when running in parallel, the
+# controlling process's seed is sent to each worker so they all agree.
+_generated_seed = None
+_used_seed = None
+
+
+def pytest_configure(config):
+    global _generated_seed
+    workerinput = getattr(config, "workerinput", None)
+    _generated_seed = Random().getrandbits(32) if workerinput is None else workerinput["random_seed"]
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    node.workerinput["random_seed"] = _generated_seed
+    # make sure the schema bundle is up to date before the workers start, so that each of them
+    # can simply load it rather than all rebuilding it at once
+    get_schema_bundle()
+
+
+def pytest_sessionfinish(session):
+    _run_stats.update(comparison_stats)
+    workeroutput = getattr(session.config, "workeroutput", None)
+    if workeroutput is not None:
+        workeroutput["run_stats"] = dict(_run_stats)
+        workeroutput["random_seed"] = _used_seed
+        workeroutput["latency_samples"] = _latency_recorder.to_dict()
+        workeroutput["latency_report"] = _latency_report_path
+        workeroutput["latency_budgets"] = _latency_budgets_config
+        workeroutput["fail_latency_budgets"] = _fail_latency_budgets
+        return
+
+    # by now any workers will have sent us all their samples
+    _latency_budget_violations[:] = check_latency_budgets(
+        parse_latency_budgets(_latency_budgets_config),
+        _latency_recorder.summarise(),
+    )
+    if _latency_budget_violations and _fail_latency_budgets and session.exitstatus == 0:
+        session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    global _used_seed, _latency_report_path, _latency_budgets_config, _fail_latency_budgets
+    workeroutput = getattr(node, "workeroutput", {})
+    _run_stats.update(workeroutput.get("run_stats", {}))
+    _used_seed = workeroutput.get("random_seed", _used_seed)
+    _latency_recorder.merge(workeroutput.get("latency_samples", {}))
+    _latency_report_path = workeroutput.get("latency_report", _latency_report_path)
+    _latency_budgets_config = workeroutput.get("latency_budgets", _latency_budgets_config)
+    _fail_latency_budgets = workeroutput.get("fail_latency_budgets", _fail_latency_budgets)
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    if item.get_closest_marker("latency_budget") is not None:
+        # only requests made by the test itself, not by its fixtures, are charged to it
+        _latency_checkpoints[item.nodeid] = _latency_recorder.checkpoint()
+    yield
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    """
+    Fail an otherwise passing test marked ``latency_budget`` if any request it made exceeded the
+    budgets given to the marker, or if none were, those configured in ``latency_budgets``. As
+    there would be nothing to check, it is also failed if ``record_latency`` is off.
+    """
+    outcome = yield
+    if call.when != "call" or item.nodeid not in _latency_checkpoints:
+        return
+
+    checkpoint = _latency_checkpoints.pop(item.nodeid)
+    report = outcome.get_result()
+    if not report.passed:
+        return
+
+    if not _record_latency:
+        # rather than silently passing, having had nothing to check
+        report.outcome = "failed"
+        report.longrepr = "Marked latency_budget, but record_latency is off so no latency was recorded to check"
+        return
 
+    marker = item.get_closest_marker("latency_budget")
+    budgets = parse_latency_budgets(marker.args[0] if marker.args else _latency_budgets_config)
+    violations = check_latency_budgets(budgets, _latency_recorder.since(checkpoint).summarise())
+    if violations:
+        report.outcome = "failed"
+        report.longrepr = "\n".join(["Latency budget exceeded:"] + [f"  {violation}" for violation in violations])
 
-# we will want to be able to seed this at some point
-_random = Random()
+
+def pytest_terminal_summary(terminalreporter):
+    """
+    Gather the outcomes of tests & subtests along with any warnings emitted into a single
+    summary. When running in parallel with pytest-xdist, this will include reports from all
+    workers.
+    """
+    counts = {"tests": Counter(), "subtests": Counter()}
+    for category, reports in terminalreporter.stats.items():
+        if category in ("", "warnings",):
+            continue
+        for report in reports:
+            kind = "subtests" if getattr(report, "context", None) is not None else "tests"
+            counts[kind][category.replace("subtests ", "")] += 1
+
+    warning_reports = terminalreporter.stats.get("warnings", ())
+
+    terminalreporter.write_sep("=", "run summary")
+    for kind, counter in counts.items():
+        terminalreporter.write_line(
+            f"{kind}: " + (", ".join(f"{n} {category}" for category, n in sorted(counter.items())) or "none")
+        )
+    terminalreporter.write_line(f"warnings: {len(warning_reports)}")
+    for warning_report in warning_reports:
+        terminalreporter.write_line(
+            f"  {warning_report.nodeid or '(no test)'}: {str(warning_report.message).strip().splitlines()[0]}"
+        )
+
+    if _used_seed is not None:
+        terminalreporter.write_line(f"random seed: {_used_seed}")
+
+    if _run_stats["comparisons"] or _run_stats["comparisons_memoised"]:
+        terminalreporter.write_line(
+            f"nested comparisons: {_run_stats['comparisons']} performed, "
+            f"{_run_stats['comparisons_memoised']} avoided by memoisation"
+        )
+        match_key_counts = {
+            k[len("match_key_"):]: n for k, n in sorted(_run_stats.items()) if k.startswith("match_key_")
+        }
+        if match_key_counts:
+            terminalreporter.write_line(
+                "sequence item lookups by key: " + ", ".join(f"{n} {k}" for k, n in match_key_counts.items())
+                + f" ({_run_stats['superset_indices_reused']} indices reused)"
+            )
+
+    if _run_stats["response_cache_hits"] or _run_stats["response_cache_misses"]:
+        terminalreporter.write_line(
+            f"response cache: {_run_stats['response_cache_hits']} hits, "
+            f"{_run_stats['response_cache_misses']} misses"
+        )
+
+    if _latency_recorder.samples:
+        terminalreporter.write_sep("-", "request latency (ms)")
+        for line in _latency_recorder.format_table():
+            terminalreporter.write_line(line)
+
+        if _latency_budget_violations:
+            terminalreporter.write_line(
+                "latency budgets exceeded over the run"
+                + (" (failing it):" if _fail_latency_budgets else ":")
+            )
+            for violation in _latency_budget_violations:
+                terminalreporter.write_line(f"  {violation}")
+
+        if _latency_report_path:
+            _latency_recorder.write_report(_latency_report_path, parse_latency_budgets(_latency_budgets_config))
+            terminalreporter.write_line(f"latency report written to {_latency_report_path}")
+
+
+def pytest_assertrepr_compare(op, left, right):
+    """
+    Rather than having pytest diff the entirety of a (potentially enormous) structure compared
+    with an AnySupersetOf, just show where the comparison found the first difference
+    """
+    if op == "==":
+        matcher = next((side for side in (right, left,) if isinstance(side, AnySupersetOfImpl)), None)
+        if matcher is not None and matcher.mismatch is not None:
+            return [f"{type(left).__name__} == {type(right).__name__}"] + matcher.describe_mismatch()
+
+
+@pytest.fixture(scope="session")
+def http_adapter(variables):
+    global _record_latency, _latency_report_path, _latency_budgets_config, _fail_latency_budgets
+    _record_latency = bool(variables.get("record_latency", False))
+    _latency_report_path = variables.get("latency_report") if _record_latency else None
+    # checked against the whole run's timings at the end, and each test marked latency_budget's
+    _latency_budgets_config = variables.get("latency_budgets") or {}
+    # only parsed here to fail early on a malformed config
+    parse_latency_budgets(_latency_budgets_config)
+    if _latency_budgets_config and not _record_latency:
+        warn("latency_budgets are configured but record_latency is off, so they won't be checked")
+    # like inc_sync_sensitive, a toggle for targets we can't expect to be fast, e.g. a local one
+    _fail_latency_budgets = bool(variables.get("fail_latency_budgets", False))
+    adapter = make_adapter(variables, _run_stats, _latency_recorder if _record_latency else None)
+    yield adapter
+    adapter.close()
 
 
 @pytest.fixture()
-def rsession(variables):
-    with requests.Session() as session:
-        session.headers = {"user-agent": variables["api_user_agent"]}
-        yield session
+def rsession(request, variables, http_adapter):
+    """
+    A session for each test, which may freely set its own auth and headers, but whose
+    connections come from a pool shared for the whole run. Tests marked ``no_response_cache``
+    will bypass any response cache.
+    """
+    adapter = http_adapter
+    if isinstance(adapter, CachingAdapter) and request.node.get_closest_marker("no_response_cache"):
+        adapter = adapter.inner
+    return new_session(variables, adapter)
+
+
+@pytest.fixture(scope="session")
+def shared_rsession(variables, http_adapter):
+    "A session for use by session-scoped fixtures, which shouldn't alter its auth or headers"
+    return new_session(variables, http_adapter)
 
 
 @pytest.fixture()
+def arsession(rsession, max_concurrent_requests):
+    """
+    An awaitable wrapper around the test's ``rsession``, for issuing independent requests
+    together using ``run_concurrently``
+    """
+    asession = AsyncSession(rsession, max_concurrent_requests)
+    yield asession
+    asession.close()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def fast_validation(variables):
+    enabled = bool(variables.get("fast_validation", True))
+    set_fast_validation(enabled)
+    return enabled
+
+
+@pytest.fixture(scope="session")
+def validation_processes(variables):
+    "The number of processes validate_many should spread large validations across, 0 for none"
+    return int(variables.get("validation_processes", 0))
+
+
+@pytest.fixture(scope="session")
+def max_concurrent_requests(variables):
+    "The most requests a single test should have in flight at once"
+    return int(variables.get("max_concurrent_requests", 4))
+
+
+@pytest.fixture(scope="session")
 def base_url(variables):
     return variables["api_base_url"]
 
@@ -66,27 +320,53 @@ def inc_fixed_data(variables):
     return True
 
 
+@pytest.fixture(scope="session")
+def random_seed(variables):
+    """
+    The seed from which all random choices in the run are derived. Set ``random_seed`` in the
+    variables to reproduce the choices made in a previous run, which is reported in the run
+    summary.
+    """
+    global _used_seed
+    seed = variables.get("random_seed")
+    _used_seed = _generated_seed if seed is None else seed
+    return _used_seed
+
+
 @pytest.fixture()
-def random_org_slug(base_url, rsession):
-    response = rsession.get(f"{base_url}/action/organization_list")
+def seeded_random(request, random_seed):
+    """
+    A Random instance for a specific test, seeded using both the run's seed and the test's id so
+    that its choices don't depend on which other tests were run before it
+    """
+    return get_test_random(random_seed, request.node.nodeid)
+
+
+@pytest.fixture(scope="session")
+def random_pool_size(variables):
+    return int(variables.get("random_pool_size", 20))
+
+
+@pytest.fixture(scope="session")
+def org_slug_pool(base_url, shared_rsession):
+    response = shared_rsession.get(f"{base_url}/action/organization_list")
     assert response.status_code == 200
-    return _random.choice(response.json()["result"])
+    return tuple(response.json()["result"])
 
 
 @pytest.fixture()
-def random_pkg_slug(base_url, rsession):
-    # make do with one of the first 200 because the full list is big & slow
-    response = rsession.get(f"{base_url}/action/package_list?limit=200")
-    assert response.status_code == 200
+def random_org_slug(seeded_random, org_slug_pool):
+    return seeded_random.choice(org_slug_pool)
 
-    suitable_names = tuple(
-        name for name in response.json()["result"] if not uuid_re.fullmatch(name) and not 'harvest' in name
-    )
 
-    if not suitable_names:
-        raise ValueError("No suitable package slugs found")
+@pytest.fixture(scope="session")
+def pkg_slug_pool(base_url, shared_rsession, random_seed, random_pool_size):
+    return get_pkg_slug_pool(shared_rsession, base_url, random_seed, random_pool_size)
+
 
-    return _random.choice(suitable_names)
+@pytest.fixture()
+def random_pkg_slug(seeded_random, pkg_slug_pool):
+    return seeded_random.choice(pkg_slug_pool)
 
 
 @pytest.fixture()
@@ -94,33 +374,37 @@ def stable_pkg_slug():
     return "example-dataset-number-one"
 
 
-@pytest.fixture()
-def random_pkg(base_url, rsession, random_pkg_slug):
-    response = rsession.get(f"{base_url}/action/package_show?id={random_pkg_slug}")
-    assert response.status_code == 200
+@pytest.fixture(scope="session")
+def _pkg_show_pool(base_url, shared_rsession):
+    "Lazily fetched package_show results for members of pkg_slug_pool, keyed by slug"
+    pool = {}
+
+    def get_pkg(slug):
+        if slug not in pool:
+            response = shared_rsession.get(f"{base_url}/action/package_show?id={slug}")
+            assert response.status_code == 200
+            pool[slug] = response.json()["result"]
+        return pool[slug]
 
-    return response.json()["result"]
+    return get_pkg
 
 
 @pytest.fixture()
-def random_harvestobject_id(base_url, rsession):
-    # in this initial request, we only care about the count so we know the range in which
-    # to make our random selection from
-    count_response = rsession.get(f"{base_url}/action/package_search?q=harvest_object_id:*&rows=1")
-    assert count_response.status_code == 200
-
-    random_index = _random.randint(0, count_response.json()["result"]["count"] - 1)
-    detail_response = rsession.get(
-        f"{base_url}/action/package_search?q=harvest_object_id:*&rows=1&start={random_index}"
-    )
-    assert detail_response.status_code == 200
+def random_pkg(_pkg_show_pool, random_pkg_slug):
+    # the pooled copy is shared between tests
+    return copy_document(_pkg_show_pool(random_pkg_slug))
+
+
+@pytest.fixture(scope="session")
+def harvestobject_id_pool(base_url, shared_rsession, random_seed, random_pool_size):
+    return get_harvestobject_id_pool(shared_rsession, base_url, random_seed, random_pool_size)
 
-    # find the harvest_object_id
-    return next((
-        kv["value"]
-        for kv in detail_response.json()["result"]["results"][0]["extras"]
-        if kv["key"] == "harvest_object_id"
-    ))
+
+@pytest.fixture()
+def random_harvestobject_id(seeded_random, harvestobject_id_pool):
+    if not harvestobject_id_pool:
+        pytest.skip("No harvested packages found on the target to choose a harvest object from")
+    return seeded_random.choice(harvestobject_id_pool)
 
 
 _unstable_keys = frozenset((
@@ -146,32 +430,21 @@ _unstable_keys = frozenset((
 ))
 
 
+_strip_rules = NormalisationRules(
+    remove_keys=_unstable_keys,
+    remove_key_value_items=_unstable_keys,
+)
+
+
 def _strip_unstable_data(obj):
-    if isinstance(obj, Mapping):
-        return {
-            k: _strip_unstable_data(v)
-            for k, v in obj.items()
-            if k not in _unstable_keys
-        }
-    elif isinstance(obj, Sequence) and not isinstance(obj, str):
-        return [
-            _strip_unstable_data(element) for element in obj
-            if not (
-                isinstance(element, Mapping)
-                and element.keys() == {"key", "value"}
-                and element["key"] in _unstable_keys
-            )
-        ]
-    else:
-        return obj
+    return normalise(obj, _strip_rules)
 
 
 # this function generates the ckan-vars.conf from the config.json file which might
-# retrieve the data from the API and then sets the value of the key to a specified value from ckan-vars.conf
-# some tests expects the ID from the file to match a value from a request
-# staging and production have the same IDs as there is a data sync but data generated 
-# on a dev stack does not have the same ID.
-def set_ckan_vars(json_data, variables):
+# retrieve the data from the API. some tests expects the ID from the file to match a value from
+# a request - staging and production have the same IDs as there is a data sync but data
+# generated on a dev stack does not have the same ID.
+def _load_ckan_vars(variables, session):
     ckan_vars = {}
     if os.path.isfile("ckan-vars.conf"):
         with open("ckan-vars.conf") as ckan_vars_file:
@@ -186,22 +459,41 @@ def set_ckan_vars(json_data, variables):
                 name, val = line.partition("=")[::2]
                 if val.startswith("FROM_API:"):
                     _, slug = val.partition(":")[::2]
-                    res = requests.get(variables.get('api_base_url') + slug)
-                    val = res.json()['result']['id']                    
+                    res = session.get(variables.get('api_base_url') + slug)
+                    val = res.json()['result']['id']
                 ckan_vars_file.write(f"{name}={val}\n")
                 ckan_vars[name] = val
+    return ckan_vars
+
+
+@pytest.fixture(scope="session")
+def ckan_vars(variables, shared_rsession):
+    return _load_ckan_vars(variables, shared_rsession)
+
 
-    str_data = json.dumps(json_data)
+def _get_ckan_vars_rules(ckan_vars):
+    return NormalisationRules(substitutions=tuple(ckan_vars.items()))
 
-    for key in ckan_vars:
-        str_data = str_data.replace(f'<<{key}>>', ckan_vars[key])
-    
-    return json.loads(str_data)
+
+# sets the value of each <<KEY>> placeholder in json_data to its value from ckan_vars
+def set_ckan_vars(json_data, ckan_vars):
+    return normalise(json_data, _get_ckan_vars_rules(ckan_vars))
 
 
 _key_value_keys = ['harvest', 'extras']
 
 
+def _get_ckan_version_rules(variables):
+    if variables.get('ckan_version') == "2.9":
+        return NormalisationRules(
+            # revisions have been removed from 2.9
+            remove_keys=frozenset(('revision_id',)),
+            # introduction of metadata modified in resources list
+            root_list_item_values=(('resources', (('metadata_modified', None),)),),
+        )
+    return NormalisationRules()
+
+
 # to use this decorator you will need to add in the variables fixture to access the ckan_version:
 #
 # @update_for_ckan_version
@@ -210,35 +502,23 @@ _key_value_keys = ['harvest', 'extras']
 def update_for_ckan_version(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        data = f(*args, **kwargs)
+        return normalise(f(*args, **kwargs), _get_ckan_version_rules(kwargs.get('variables')))
+    return decorated
 
-        if kwargs.get('variables').get('ckan_version') == "2.9":
-            # revisions have been removed from 2.9  
-            data = remove_element(data, ['revision_id'])
 
-            # introduction of metadata modified in resources list
-            for key in data.keys():
-                if key == 'resources':
-                    for item in data[key]:
-                        item['metadata_modified'] = None
+def remove_element(in_data, removed_elements=[]):
+    return normalise(in_data, NormalisationRules(remove_keys=frozenset(removed_elements)))
 
-        return data
-    return decorated
 
+_clean_rules = NormalisationRules(
+    placeholder_keys=_unstable_keys,
+    root_exempt_keys=frozenset(('id',)),
+    key_value_keys=frozenset(_key_value_keys),
+)
 
-def remove_element(in_data, removed_elements=[]):
-    data = {}
-    for key in in_data.keys():
-        if key not in removed_elements:
-            if isinstance(in_data[key], list):
-                data[key] = []
-                for item in in_data[key]:
-                    data[key].append(remove_element(item, removed_elements))
-            elif isinstance(in_data[key], dict):
-                data[key] = remove_element(in_data[key], removed_elements)
-            else:
-                data[key] = in_data[key]
-    return data
+
+def _get_clean_rules(is_key_value=True):
+    return _clean_rules._replace(collapse_root_key_value_keys=not is_key_value)
 
 
 # rather than remove unstable elements from a response, this function cleans the unstable elements
@@ -250,82 +530,60 @@ def remove_element(in_data, removed_elements=[]):
 def clean_unstable_elements(json_data, parent=None, is_key_value=True):
     if isinstance(json_data, str):
         return
-    for key in json_data.keys():
-        if key in _key_value_keys:
-            if is_key_value:
-                for item in json_data[key]:
-                    item_key = item["key"]
-                    item["value"] = f"<<{item_key}-value>>"
-            else:
-                json_data[key] = f"<<{key}>>"
-        elif isinstance(json_data[key], list):
-            for item in json_data[key]:
-                clean_unstable_elements(item, key)
-        elif isinstance(json_data[key], dict):
-            clean_unstable_elements(json_data[key], key)
-        elif key in _unstable_keys and not str(json_data[key]).startswith("<<"):
-            if not (key == "id" and not parent):
-                json_data[key] = f"<<{key}>>"
-    return json_data
+    return normalise(json_data, _get_clean_rules(is_key_value), is_root=not parent)
 
 
+# the stable fixtures combine all the rules they need so that each is normalised in a single walk,
+# their <<KEY>> placeholders being written directly into the locations indexed when the file was loaded
 @pytest.fixture()
-@update_for_ckan_version
-def stable_pkg(variables, inc_fixed_data):
-    json_data = get_example_response(
+def stable_pkg(variables, inc_fixed_data, ckan_vars):
+    template = get_example_response_template(
         "stable/package_show.inner.test.json"
     )
-    return set_ckan_vars(json_data, variables)
+    return normalise(template.render(ckan_vars), _get_ckan_version_rules(variables))
 
 
 @pytest.fixture()
-@update_for_ckan_version
-def stable_pkg_search(variables, inc_fixed_data):
-    return set_ckan_vars(
-        clean_unstable_elements(
-            get_example_response("stable/package_search.inner.test.json")
-        ),
-        variables
+def stable_pkg_search(variables, inc_fixed_data, ckan_vars):
+    template = get_example_response_template("stable/package_search.inner.test.json")
+    return template.substitute(
+        normalise(template.new(), _get_clean_rules(), _get_ckan_version_rules(variables)),
+        ckan_vars,
     )
 
 
 @pytest.fixture()
-@update_for_ckan_version
-def stable_pkg_default_schema(variables, inc_fixed_data):
-    json_data = get_example_response(
+def stable_pkg_default_schema(variables, inc_fixed_data, ckan_vars):
+    template = get_example_response_template(
         "stable/package_show{}.default_schema.inner.test.json".format('-2.9' if variables['ckan_version'] == '2.9' else '')
     )
 
-    return set_ckan_vars(json_data, variables)
+    return normalise(template.render(ckan_vars), _get_ckan_version_rules(variables))
 
 
 @pytest.fixture()
 def stable_org(inc_fixed_data):
-    return _strip_unstable_data(
-        clean_unstable_elements(
-            get_example_response(
-                "stable/organization_show.inner.test.json"
-            )
-        )
+    return normalise(
+        get_example_response(
+            "stable/organization_show.inner.test.json"
+        ),
+        _get_clean_rules(),
+        _strip_rules,
     )
 
 
 @pytest.fixture()
-@update_for_ckan_version
-def stable_org_with_datasets(variables, inc_fixed_data):
-    return set_ckan_vars(
-        get_example_response(
+def stable_org_with_datasets(variables, inc_fixed_data, ckan_vars):
+    return normalise(
+        get_example_response_template(
             "stable/organization_show_with_datasets.inner.test.json"
-        ),
-        variables
+        ).render(ckan_vars),
+        _get_ckan_version_rules(variables),
     )
 
 
 @pytest.fixture()
-def stable_dataset(variables, inc_fixed_data):
-    return set_ckan_vars(
-        get_example_response(
+def stable_dataset(variables, inc_fixed_data, ckan_vars):
+    return get_example_response_template(
         "stable/search_dataset{}.inner.test.json".format('-2.9' if variables['ckan_version'] == '2.9' else '')
-        ),
-        variables
-    )
+    ).render(ckan_vars)
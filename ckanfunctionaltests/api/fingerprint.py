@@ -0,0 +1,75 @@
+from hashlib import blake2b
+import json
+from typing import Iterable, Optional
+
+
+_digest_size = 16
+
+
+def item_digest(item) -> bytes:
+    "A digest of a JSON-compatible ``item`` which is insensitive to the order of mapping keys"
+    return blake2b(
+        json.dumps(item, sort_keys=True, separators=(",", ":",)).encode("utf-8"),
+        digest_size=_digest_size,
+    ).digest()
+
+
+class RollingFingerprint:
+    """
+    An order-sensitive fingerprint of a sequence of JSON-compatible items, fed to it a page at a
+    time. Each item is folded into a rolling (chained) digest, the running value of which is kept
+    for every position, alongside an independent digest of each page. This costs a fixed 16 bytes
+    per item rather than the items themselves, while still allowing the position of the first
+    difference between two fingerprinted sequences to be found by bisection.
+    """
+    def __init__(self):
+        self._rolling = bytearray()
+        self.pages = []
+
+    def __len__(self):
+        return len(self._rolling) // _digest_size
+
+    def prefix_digest(self, n: int) -> bytes:
+        "The rolling digest after the first ``n`` items"
+        return bytes(self._rolling[(n-1)*_digest_size:n*_digest_size]) if n else b""
+
+    @property
+    def digest(self) -> bytes:
+        return self.prefix_digest(len(self))
+
+    def update(self, items: Iterable) -> bytes:
+        "Fold a page of ``items`` into the fingerprint, returning the page's own digest"
+        start = len(self)
+        rolling = self.digest
+        page_hash = blake2b(digest_size=_digest_size)
+        for item in items:
+            digest = item_digest(item)
+            page_hash.update(digest)
+            rolling = blake2b(rolling + digest, digest_size=_digest_size).digest()
+            self._rolling += rolling
+
+        self.pages.append((start, len(self), page_hash.digest(),))
+        return self.pages[-1][2]
+
+    def first_difference(self, other: "RollingFingerprint") -> Optional[int]:
+        """
+        Return the index of the first item differing between the two sequences, or None if they
+        appear identical. If one sequence is a prefix of the other, this is the length of the
+        shorter.
+        """
+        lo, hi = 0, min(len(self), len(other))
+        if self.prefix_digest(hi) == other.prefix_digest(hi):
+            return None if len(self) == len(other) else hi
+
+        # invariant: prefixes of length lo are equal, prefixes of length hi differ
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if self.prefix_digest(mid) == other.prefix_digest(mid):
+                lo = mid
+            else:
+                hi = mid
+        return lo
+
+    def page_of(self, index: int) -> Optional[tuple]:
+        "The (start, end, digest) of the page containing the item at ``index``, if any"
+        return next((page for page in self.pages if page[0] <= index < page[1]), None)
@@ -0,0 +1,265 @@
+from collections import Counter, namedtuple
+import json
+from math import ceil
+import re
+from threading import Lock, local
+from time import perf_counter
+from typing import Iterable, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+from requests.adapters import BaseAdapter, HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from ckanfunctionaltests.api import uuid_re
+from ckanfunctionaltests.api.adapters import ObservedRaw, WrappingAdapter
+
+
+# times in seconds. connect is the time spent establishing a new connection (including name
+# resolution and any TLS handshake) for the request, 0 if a pooled connection was reused. ttfb
+# is the time until the response's headers were received, total until its body was.
+LatencySample = namedtuple("LatencySample", ("connect", "ttfb", "total", "size", "status",))
+
+
+# a budget's limit is in seconds, applying to the given statistic ("p95", "max" etc.) of the
+# given timing ("connect", "ttfb" or "total") of any endpoint its pattern is found in
+LatencyBudget = namedtuple("LatencyBudget", ("pattern", "timing", "statistic", "limit",))
+
+
+_percentiles = (50, 95, 99,)
+_budget_key_re = re.compile(r"(?:(?P<timing>connect|ttfb|total)_)?(?P<statistic>p(?:50|95|99)|max)")
+
+
+def get_endpoint(method: str, url: str) -> str:
+    """
+    A normalised description of the endpoint ``url`` requests, under which its timings are
+    grouped: any uuids in its path are replaced by a placeholder and only the names of its
+    query parameters are kept, e.g. ``GET /api/3/action/organization_show?id&include_datasets``
+    """
+    _, _, path, query, _ = urlsplit(url)
+    param_names = sorted({name for name, _ in parse_qsl(query, keep_blank_values=True)})
+    return f"{method} {uuid_re.sub('{id}', path)}" + (f"?{'&'.join(param_names)}" if param_names else "")
+
+
+def percentile(sorted_values: list, p: float) -> Optional[float]:
+    "The nearest-rank ``p``th percentile of the already-sorted ``sorted_values``"
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def parse_latency_budgets(budgets_config: dict) -> tuple:
+    """
+    LatencyBudgets from their configured form, a mapping of endpoint regexes to mappings of
+    statistics to limits in milliseconds, e.g. ``{"action/package_search": {"p95": 2000,
+    "ttfb_max": 5000}}``. Statistics without a timing prefix apply to the total time.
+    """
+    budgets = []
+    for pattern, limits in budgets_config.items():
+        for key, limit_ms in limits.items():
+            match = _budget_key_re.fullmatch(key)
+            if match is None:
+                raise ValueError(f"Unrecognised latency budget statistic {key!r} for {pattern!r}")
+            budgets.append(LatencyBudget(
+                re.compile(pattern),
+                match["timing"] or "total",
+                match["statistic"],
+                limit_ms / 1000,
+            ))
+    return tuple(budgets)
+
+
+def check_latency_budgets(budgets: Iterable[LatencyBudget], summary: dict) -> list:
+    "Descriptions of each way the endpoints in a LatencyRecorder's ``summary`` exceed ``budgets``"
+    violations = []
+    for endpoint, endpoint_summary in summary.items():
+        for budget in budgets:
+            if not budget.pattern.search(endpoint):
+                continue
+            value = endpoint_summary[budget.timing][budget.statistic]
+            if value > budget.limit:
+                violations.append(
+                    f"{endpoint}: {budget.timing} {budget.statistic} of {value * 1000:.0f}ms exceeds budget of "
+                    f"{budget.limit * 1000:.0f}ms ({endpoint_summary['count']} requests)"
+                )
+    return violations
+
+
+class LatencyRecorder:
+    "A thread-safe collection of LatencySamples, grouped by endpoint"
+    def __init__(self):
+        self.samples = {}
+        self._lock = Lock()
+
+    def record(self, endpoint: str, sample: LatencySample) -> None:
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append(sample)
+
+    def to_dict(self) -> dict:
+        "The samples in a form which can be sent from an xdist worker and ``merge``d by the controller"
+        with self._lock:
+            return {endpoint: [tuple(sample) for sample in samples] for endpoint, samples in self.samples.items()}
+
+    def merge(self, samples_dict: dict) -> None:
+        with self._lock:
+            for endpoint, samples in samples_dict.items():
+                self.samples.setdefault(endpoint, []).extend(LatencySample(*sample) for sample in samples)
+
+    def checkpoint(self) -> dict:
+        "A marker of the samples recorded so far, from which ``since`` can find any recorded later"
+        with self._lock:
+            return {endpoint: len(samples) for endpoint, samples in self.samples.items()}
+
+    def since(self, checkpoint: dict) -> "LatencyRecorder":
+        "A new LatencyRecorder holding only the samples recorded after ``checkpoint`` was taken"
+        recorder = LatencyRecorder()
+        with self._lock:
+            for endpoint, samples in self.samples.items():
+                new_samples = samples[checkpoint.get(endpoint, 0):]
+                if new_samples:
+                    recorder.samples[endpoint] = new_samples
+        return recorder
+
+    def summarise(self) -> dict:
+        "Percentiles and totals of each endpoint's samples, as written to the report"
+        with self._lock:
+            samples_by_endpoint = {endpoint: tuple(samples) for endpoint, samples in self.samples.items()}
+
+        summary = {}
+        for endpoint, samples in sorted(samples_by_endpoint.items()):
+            timings = {
+                field: sorted(getattr(sample, field) for sample in samples)
+                for field in ("connect", "ttfb", "total",)
+            }
+            summary[endpoint] = {
+                "count": len(samples),
+                "statuses": {str(status): n for status, n in sorted(Counter(s.status for s in samples).items())},
+                "new_connections": sum(1 for sample in samples if sample.connect),
+                **{
+                    field: {
+                        **{f"p{p}": percentile(values, p) for p in _percentiles},
+                        "max": values[-1],
+                    } for field, values in timings.items()
+                },
+                "size": {
+                    "mean": sum(sample.size for sample in samples) / len(samples),
+                    "max": max(sample.size for sample in samples),
+                },
+            }
+        return summary
+
+    def write_report(self, path: str, budgets: Iterable[LatencyBudget] = ()) -> None:
+        summary = self.summarise()
+        report = {"endpoints": summary}
+        if budgets:
+            report["budget_violations"] = check_latency_budgets(budgets, summary)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    def format_table(self) -> Iterable[str]:
+        "Lines of a table of each endpoint's ttfb & total percentiles in milliseconds"
+        summary = self.summarise()
+        endpoint_width = max((len(endpoint) for endpoint in summary), default=0)
+        timing_headers = [f"{field} p{p}" for field in ("ttfb", "total",) for p in _percentiles]
+        yield "  ".join(
+            [f"{'endpoint':<{endpoint_width}}", f"{'n':>5}"]
+            + [f"{header:>10}" for header in timing_headers]
+            + [f"{'mean KiB':>9}", "statuses"]
+        )
+        for endpoint, endpoint_summary in summary.items():
+            yield "  ".join(
+                [f"{endpoint:<{endpoint_width}}", f"{endpoint_summary['count']:>5}"]
+                + [
+                    f"{endpoint_summary[field][f'p{p}'] * 1000:>10.1f}"
+                    for field in ("ttfb", "total",) for p in _percentiles
+                ]
+                + [
+                    f"{endpoint_summary['size']['mean'] / 1024:>9.1f}",
+                    ",".join(f"{n}x{status}" for status, n in endpoint_summary["statuses"].items()),
+                ]
+            )
+
+
+# the timings of the request currently being sent in this thread, if any. connections are
+# established deep inside urllib3, from where they can only report back this way.
+_current = local()
+
+
+class _TimedConnectionMixin:
+    def connect(self):
+        start = perf_counter()
+        try:
+            super().connect()
+        finally:
+            if getattr(_current, "connect", None) is not None:
+                _current.connect += perf_counter() - start
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    An HTTPAdapter whose connections report the time taken to establish them to a LatencyRecordingAdapter. This
+    relies on urllib3 1.x's connection & pool classes, which is why urllib3 is pinned below 2.
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class LatencyRecordingAdapter(WrappingAdapter):
+    """
+    Records a LatencySample in ``recorder`` for each request sent through the ``inner`` adapter,
+    which should be a TimedHTTPAdapter for connection times to be known. The sample is recorded
+    when the response body has been read to the end, so streamed responses abandoned early are
+    never recorded. Timings include any retries the inner adapter makes.
+    """
+    def __init__(self, inner: BaseAdapter, recorder: LatencyRecorder):
+        super().__init__(inner)
+        self.recorder = recorder
+
+    def send(self, request, **kwargs):
+        endpoint = get_endpoint(request.method, request.url)
+        _current.connect = 0.
+        start = perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+        finally:
+            connect = _current.connect
+            _current.connect = None
+        ttfb = perf_counter() - start
+
+        size = 0
+
+        def on_chunk(chunk):
+            nonlocal size
+            size += len(chunk)
+
+        def on_done():
+            self.recorder.record(endpoint, LatencySample(
+                connect,
+                ttfb,
+                perf_counter() - start,
+                size,
+                response.status_code,
+            ))
+
+        response.raw = ObservedRaw(response.raw, on_chunk, on_done)
+        return response
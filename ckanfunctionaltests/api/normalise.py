@@ -0,0 +1,255 @@
+from collections import namedtuple
+from collections.abc import Mapping
+from copy import deepcopy
+from functools import lru_cache
+import re
+
+
+class NormalisationRules(namedtuple("NormalisationRules", (
+    "remove_keys",
+    "remove_key_value_items",
+    "placeholder_keys",
+    "root_exempt_keys",
+    "key_value_keys",
+    "collapse_root_key_value_keys",
+    "root_list_item_values",
+    "substitutions",
+), defaults=(
+    frozenset(),
+    frozenset(),
+    frozenset(),
+    frozenset(),
+    frozenset(),
+    False,
+    (),
+    (),
+))):
+    """
+    A declarative description of how a document should be normalised:
+
+    - ``remove_keys``: mapping keys to remove wherever they are found
+    - ``remove_key_value_items``: ``{"key": ..., "value": ...}`` items to remove from any sequence if their "key"
+      is one of these
+    - ``placeholder_keys``: mapping keys whose scalar values are replaced with a ``<<key>>`` placeholder (unless the
+      value already is a placeholder)...
+    - ``root_exempt_keys``: ...except for these keys in the root mapping of the document
+    - ``key_value_keys``: mapping keys holding lists of ``{"key": ..., "value": ...}`` items, the values of which
+      are replaced with ``<<item-key-value>>`` placeholders
+    - ``collapse_root_key_value_keys``: instead replace the whole value of any ``key_value_keys`` found in the
+      root mapping with a ``<<key>>`` placeholder
+    - ``root_list_item_values``: pairs of (key, values), the mapping items of a list found at ``key`` in the root
+      mapping being updated with the (key, value) pairs of ``values``
+    - ``substitutions``: pairs of (name, value), any ``<<name>>`` placeholders in strings being replaced by value
+
+    Rules can be combined using ``+``, which is equivalent to applying both sets of rules in turn as long as
+    neither undoes the work of the other.
+    """
+    __slots__ = ()
+
+    def __add__(self, other):
+        return NormalisationRules(
+            remove_keys=self.remove_keys | other.remove_keys,
+            remove_key_value_items=self.remove_key_value_items | other.remove_key_value_items,
+            placeholder_keys=self.placeholder_keys | other.placeholder_keys,
+            root_exempt_keys=self.root_exempt_keys | other.root_exempt_keys,
+            key_value_keys=self.key_value_keys | other.key_value_keys,
+            collapse_root_key_value_keys=self.collapse_root_key_value_keys or other.collapse_root_key_value_keys,
+            root_list_item_values=tuple(self.root_list_item_values) + tuple(other.root_list_item_values),
+            substitutions=tuple(self.substitutions) + tuple(other.substitutions),
+        )
+
+
+class Normaliser:
+    """
+    Applies ``rules`` to documents in a single walk, modifying them in place. Documents are expected to be the
+    product of JSON parsing, i.e. consisting of dicts, lists and scalars.
+    """
+    def __init__(self, rules: NormalisationRules):
+        self.rules = rules
+        self._substitutions = dict(rules.substitutions)
+        self._substitution_re = re.compile(
+            "<<(" + "|".join(re.escape(name) for name in self._substitutions) + ")>>"
+        ) if self._substitutions else None
+
+    def __call__(self, doc, is_root: bool = True):
+        "Normalise ``doc`` in place, returning it. ``is_root`` being False disables any rules specific to the root"
+        if isinstance(doc, dict):
+            self._normalise_mapping(doc, is_root)
+        elif isinstance(doc, list):
+            self._normalise_list(doc)
+        elif isinstance(doc, str):
+            return self._substitute(doc)
+        return doc
+
+    def _substitute(self, value: str) -> str:
+        if self._substitution_re is None or "<<" not in value:
+            return value
+        return self._substitution_re.sub(lambda match: self._substitutions[match.group(1)], value)
+
+    def _normalise_mapping(self, mapping: dict, is_root: bool):
+        rules = self.rules
+        renamed_keys = False
+        for key in tuple(mapping):
+            if key in rules.remove_keys:
+                del mapping[key]
+                continue
+
+            value = mapping[key]
+            if key in rules.key_value_keys and is_root and rules.collapse_root_key_value_keys:
+                mapping[key] = f"<<{key}>>"
+            elif isinstance(value, list):
+                self._normalise_list(value)
+                if key in rules.key_value_keys:
+                    for item in value:
+                        if isinstance(item, Mapping) and "key" in item:
+                            item["value"] = f"<<{item['key']}-value>>"
+            elif isinstance(value, dict):
+                self._normalise_mapping(value, False)
+            elif (
+                key in rules.placeholder_keys
+                and not str(value).startswith("<<")
+                and not (is_root and key in rules.root_exempt_keys)
+            ):
+                mapping[key] = f"<<{key}>>"
+            elif isinstance(value, str):
+                mapping[key] = self._substitute(value)
+
+            renamed_keys = renamed_keys or (isinstance(key, str) and self._substitute(key) != key)
+
+        if renamed_keys:
+            # rebuilding the mapping preserves the order of its keys
+            items = tuple(mapping.items())
+            mapping.clear()
+            mapping.update((self._substitute(k) if isinstance(k, str) else k, v) for k, v in items)
+
+        if is_root:
+            for key, values in rules.root_list_item_values:
+                for item in (mapping.get(key) or ()):
+                    if isinstance(item, dict):
+                        item.update(values)
+
+    def _normalise_list(self, seq: list):
+        if self.rules.remove_key_value_items:
+            seq[:] = (
+                item for item in seq
+                if not (
+                    isinstance(item, Mapping)
+                    and item.keys() == {"key", "value"}
+                    and item["key"] in self.rules.remove_key_value_items
+                )
+            )
+
+        for i, item in enumerate(seq):
+            if isinstance(item, dict):
+                self._normalise_mapping(item, False)
+            elif isinstance(item, list):
+                self._normalise_list(item)
+            elif isinstance(item, str):
+                seq[i] = self._substitute(item)
+
+
+_immutable_json_types = frozenset((str, int, float, bool, type(None),))
+
+
+def copy_document(doc):
+    """
+    A deep copy of ``doc``, a document produced by JSON parsing. Only its dicts and lists are recreated, its
+    immutable scalars being shared, which is considerably quicker than ``copy.deepcopy`` with its memo and
+    per-object dispatch. Anything unexpected falls back to ``copy.deepcopy``.
+    """
+    doc_type = type(doc)
+    if doc_type is dict:
+        return {
+            key: value if type(value) in _immutable_json_types else copy_document(value)
+            for key, value in doc.items()
+        }
+    if doc_type is list:
+        return [
+            value if type(value) in _immutable_json_types else copy_document(value)
+            for value in doc
+        ]
+    if doc_type in _immutable_json_types:
+        return doc
+    return deepcopy(doc)
+
+
+_placeholder_re = re.compile(r"<<([^<>]+)>>")
+
+
+class PlaceholderTemplate:
+    """
+    A document along with the locations of all the ``<<name>>`` placeholders in its string values, found once on
+    construction so that values can be written straight into those locations of each copy of the document rather
+    than searching the whole document (or a serialisation of it) every time.
+
+    ``doc`` itself is never modified.
+    """
+    __slots__ = ("doc", "_locations",)
+
+    def __init__(self, doc):
+        self.doc = doc
+        # (path of containing object, key within it, original string, parts of the string split by placeholder)
+        self._locations = tuple(self._find_locations(doc, ()))
+
+    @classmethod
+    def _find_locations(cls, obj, path: tuple):
+        if isinstance(obj, dict):
+            items = obj.items()
+        elif isinstance(obj, list):
+            items = enumerate(obj)
+        else:
+            return
+
+        for key, value in items:
+            if isinstance(value, str):
+                parts = _placeholder_re.split(value)
+                if len(parts) > 1:
+                    yield path, key, value, tuple(parts)
+            else:
+                yield from cls._find_locations(value, path + (key,))
+
+    @property
+    def names(self) -> frozenset:
+        "The names of all placeholders found in the document"
+        return frozenset(name for *_, parts in self._locations for name in parts[1::2])
+
+    def new(self):
+        "A fresh copy of the document, placeholders intact"
+        return copy_document(self.doc)
+
+    def substitute(self, doc, values: Mapping):
+        """
+        Replace the placeholders in ``doc``, a copy produced by ``new``, with their entries in ``values`` in place,
+        returning ``doc``. Placeholders without an entry are left alone, as are any locations no longer holding their
+        original string, so the copy may have been otherwise normalised in the meantime.
+        """
+        for path, key, original, parts in self._locations:
+            container = doc
+            try:
+                for step in path:
+                    container = container[step]
+                if container[key] is not original:
+                    continue
+            except (KeyError, IndexError, TypeError):
+                continue
+
+            container[key] = "".join(
+                values.get(part, f"<<{part}>>") if i % 2 else part
+                for i, part in enumerate(parts)
+            )
+        return doc
+
+    def render(self, values: Mapping):
+        "A fresh copy of the document with placeholders replaced by their entries in ``values``"
+        return self.substitute(self.new(), values)
+
+
+@lru_cache(maxsize=32)
+def get_normaliser(rules: NormalisationRules) -> Normaliser:
+    "A (cached) Normaliser for ``rules``, which must be hashable"
+    return Normaliser(rules)
+
+
+def normalise(doc, *rules: NormalisationRules, is_root: bool = True):
+    "Normalise ``doc`` in place according to the combination of all ``rules`` in a single walk, returning it"
+    return get_normaliser(sum(rules, NormalisationRules()))(doc, is_root=is_root)
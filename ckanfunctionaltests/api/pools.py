@@ -0,0 +1,77 @@
+from math import ceil
+from random import Random
+
+from requests import Session
+
+from ckanfunctionaltests.api import uuid_re
+
+
+def get_pool_random(seed, pool_name: str) -> Random:
+    """
+    A Random for choosing the members of the pool ``pool_name``, derived from the run's ``seed``
+    so that a run with the same seed chooses the same members, independent of any other pool
+    """
+    return Random(f"{seed}:{pool_name}")
+
+
+def get_test_random(seed, nodeid: str) -> Random:
+    """
+    A Random for a specific test, derived from the run's ``seed`` and the test's ``nodeid`` so
+    that its choices don't depend on which other tests were run before it
+    """
+    return Random(f"{seed}:{nodeid}")
+
+
+def get_pkg_slug_pool(session: Session, base_url: str, seed, pool_size: int) -> tuple:
+    "A random selection of up to ``pool_size`` slugs of ordinary (non-harvested) packages"
+    # make do with the first 200 because the full list is big & slow
+    response = session.get(f"{base_url}/action/package_list?limit=200")
+    assert response.status_code == 200
+
+    suitable_names = tuple(
+        name for name in response.json()["result"] if not uuid_re.fullmatch(name) and not 'harvest' in name
+    )
+
+    if not suitable_names:
+        raise ValueError("No suitable package slugs found")
+
+    return tuple(get_pool_random(seed, "pkg_slug_pool").sample(
+        suitable_names,
+        min(pool_size, len(suitable_names)),
+    ))
+
+
+def get_harvestobject_id_pool(session: Session, base_url: str, seed, pool_size: int, page_size: int = 5) -> tuple:
+    """
+    A random selection of up to ``pool_size`` harvest object ids, drawn from pages of ``page_size``
+    harvested packages taken from independent random points in the whole range of them. Empty if
+    the target has no harvested packages.
+    """
+    # in this initial request, we only care about the count so we know the range in which
+    # to make our random selection from
+    count_response = session.get(f"{base_url}/action/package_search?q=harvest_object_id:*&rows=0")
+    assert count_response.status_code == 200
+    count = count_response.json()["result"]["count"]
+    if not count:
+        return ()
+
+    starts = range(max(1, count - page_size + 1))
+    pool = {}
+    for start in sorted(get_pool_random(seed, "harvestobject_id_pool").sample(
+        starts,
+        min(len(starts), ceil(pool_size / page_size)),
+    )):
+        detail_response = session.get(
+            f"{base_url}/action/package_search?q=harvest_object_id:*&rows={page_size}&start={start}"
+        )
+        assert detail_response.status_code == 200
+
+        # find the harvest_object_ids, pages possibly overlapping
+        pool.update(dict.fromkeys(
+            kv["value"]
+            for result in detail_response.json()["result"]["results"]
+            for kv in result["extras"]
+            if kv["key"] == "harvest_object_id"
+        ))
+
+    return tuple(pool)[:pool_size]
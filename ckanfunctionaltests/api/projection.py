@@ -0,0 +1,58 @@
+from typing import Sequence
+
+from ckanfunctionaltests.api import get_projected_schema, validate_against_schema
+
+
+class Projection:
+    """
+    A test's declaration of the only ``fields`` of each of a response's results (the array at ``results_path``)
+    that it reads. This allows a narrower ``fl`` to be requested from CKAN where it is supported, and the
+    response to be validated against a variant of its schema only enforcing the declared fields of each result,
+    whose schema is any of ``item_schema_names``.
+    """
+    def __init__(self, fields: Sequence[str], item_schema_names: Sequence[str], results_path: Sequence[str]):
+        self.fields = tuple(fields)
+        self.item_schema_names = tuple(item_schema_names)
+        self.results_path = tuple(results_path)
+
+    @property
+    def fl(self) -> str:
+        return ",".join(self.fields)
+
+    def fl_param(self, supported: bool = True) -> str:
+        "A query string fragment requesting only the projected fields, if ``supported`` by the endpoint"
+        return f"&fl={self.fl}" if supported else ""
+
+    def project(self, response_json):
+        """
+        Drop any undeclared fields from the results of ``response_json`` in place, returning it. Results that
+        aren't objects (e.g. the raw strings of the legacy search api) are left alone. Validate first, so that
+        checks applying to all of a result's keys still see any undeclared fields CKAN returned.
+        """
+        results = response_json
+        for key in self.results_path:
+            results = results[key]
+
+        for result in results:
+            if isinstance(result, dict):
+                for key in tuple(result):
+                    if key not in self.fields:
+                        del result[key]
+        return response_json
+
+    def validate(self, response_json, schema_name: str) -> None:
+        "Validate ``response_json`` against the projection of the named schema"
+        validate_against_schema(
+            response_json,
+            get_projected_schema(schema_name, self.item_schema_names, self.fields),
+        )
+
+
+def package_search_projection(*fields: str) -> Projection:
+    "A Projection of the results of an action api package_search response"
+    return Projection(fields, ("package_base",), ("result", "results",))
+
+
+def search_dataset_projection(*fields: str) -> Projection:
+    "A Projection of the results of a (possibly unwrapped v3) legacy api search/dataset response"
+    return Projection(fields, ("dataset_base", "dataset_base_2_9",), ("results",))
@@ -0,0 +1,170 @@
+from glob import glob
+from hashlib import sha1, sha256
+import json
+import marshal
+import os
+import os.path
+import sys
+import tempfile
+from typing import Callable, Iterable, Optional
+
+try:
+    import fastjsonschema
+    from fastjsonschema.ref_resolver import RefResolver as _FastRefResolver
+except ImportError:
+    fastjsonschema = None
+
+
+_bundle_format = 1
+
+
+def get_default_bundle_path(schemas_dir: str) -> str:
+    """
+    Where to keep the bundle for ``schemas_dir`` by default: in the user's cache directory rather than alongside the
+    schemas, which may be installed somewhere read-only. Named for ``schemas_dir`` so that bundles for separate
+    checkouts don't keep replacing each other.
+    """
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    schemas_dir_hash = sha1(os.path.abspath(schemas_dir).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, "ckan-functional-tests", f"schema-bundle-{schemas_dir_hash}.marshal")
+
+
+def get_schema_paths(schemas_dir: str) -> list:
+    return sorted(glob(os.path.join(schemas_dir, "*.schema.json")))
+
+
+def _get_schema_name(schema_path: str) -> str:
+    return os.path.basename(".".join(schema_path.split(".")[:-2]))
+
+
+def _get_source(schema_path: str) -> tuple:
+    "The (mtime_ns, size) of a schema file, which is all a fresh bundle needs to compare"
+    stat = os.stat(schema_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _get_digest(schema_path: str) -> bytes:
+    with open(schema_path, "rb") as f:
+        return sha256(f.read()).digest()
+
+
+def _get_key(format_names: Iterable[str]) -> tuple:
+    "Everything other than the schemas themselves that the contents of a bundle depend upon"
+    return (
+        _bundle_format,
+        sys.implementation.cache_tag,
+        fastjsonschema and fastjsonschema.VERSION,
+        tuple(sorted(format_names)),
+    )
+
+
+def build_bundle(schemas_dir: str, schema_id_base: str, formats: dict) -> dict:
+    """
+    Parse all the schemas in ``schemas_dir`` into a store keyed by their resolved ids and, if fastjsonschema is
+    installed, generate & compile a validator for each of them, returning it all as a marshallable dict.
+    """
+    sources = {}
+    store = {}
+    for schema_path in get_schema_paths(schemas_dir):
+        with open(schema_path, "rb") as f:
+            content = f.read()
+        sources[os.path.basename(schema_path)] = _get_source(schema_path) + (sha256(content).digest(),)
+        store[schema_id_base + _get_schema_name(schema_path)] = json.loads(content)
+
+    validators = {}
+    if fastjsonschema is not None:
+        for schema_id, schema in store.items():
+            handlers = {"http": store.__getitem__}
+            code = fastjsonschema.compile_to_code(schema, handlers=handlers, formats=formats, use_default=False)
+            validators[schema_id[len(schema_id_base):]] = (
+                _FastRefResolver.from_schema(schema, handlers=handlers, store={}).get_scope_name(),
+                marshal.dumps(compile(code, f"<schema bundle: {schema_id}>", "exec")),
+            )
+
+    return {
+        "key": _get_key(formats),
+        "sources": sources,
+        "store": store,
+        "validators": validators,
+    }
+
+
+def write_bundle(bundle_path: str, bundle: dict) -> None:
+    """
+    Write ``bundle`` to ``bundle_path`` atomically, so that concurrent readers never see a partial file and
+    concurrent writers (e.g. parallel workers all finding a stale bundle) can only replace each other's whole bundle
+    """
+    os.makedirs(os.path.dirname(bundle_path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(bundle_path), prefix=".tmp-schema-bundle")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            marshal.dump(bundle, f)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, bundle_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _is_fresh(bundle: dict, schemas_dir: str, format_names: Iterable[str]) -> bool:
+    if bundle.get("key") != _get_key(format_names):
+        return False
+
+    sources = bundle["sources"]
+    schema_paths = get_schema_paths(schemas_dir)
+    if sorted(sources) != [os.path.basename(schema_path) for schema_path in schema_paths]:
+        return False
+
+    for schema_path in schema_paths:
+        mtime_ns, size, digest = sources[os.path.basename(schema_path)]
+        if _get_source(schema_path) != (mtime_ns, size) and _get_digest(schema_path) != digest:
+            # only bother hashing the file if its stat has changed, which e.g. a checkout can
+            # do without changing its content
+            return False
+
+    return True
+
+
+def load_bundle(bundle_path: str, schemas_dir: str, format_names: Iterable[str]) -> Optional[dict]:
+    "Returns the bundle at ``bundle_path`` if it exists and is up to date with ``schemas_dir``, otherwise None"
+    try:
+        with open(bundle_path, "rb") as f:
+            bundle = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+    if not isinstance(bundle, dict) or not _is_fresh(bundle, schemas_dir, format_names):
+        return None
+
+    return bundle
+
+
+def get_bundle(bundle_path: str, schemas_dir: str, schema_id_base: str, formats: dict) -> dict:
+    """
+    Load the bundle at ``bundle_path``, (re)building it if it is missing or stale. A rebuilt bundle is written
+    back to ``bundle_path`` if possible.
+    """
+    bundle = load_bundle(bundle_path, schemas_dir, formats)
+    if bundle is None:
+        bundle = build_bundle(schemas_dir, schema_id_base, formats)
+        try:
+            write_bundle(bundle_path, bundle)
+        except OSError:
+            # e.g. an installation we can't write to - we'll just have to rebuild it next time
+            pass
+
+    return bundle
+
+
+def load_validator(bundle: dict, schema_name: str) -> Optional[Callable]:
+    """
+    The unbound validator function for ``schema_name`` compiled into ``bundle``, which should be called with
+    ``custom_formats`` as fastjsonschema's own would be. None if the bundle has no validator for it.
+    """
+    if schema_name not in bundle["validators"]:
+        return None
+
+    scope_name, code = bundle["validators"][schema_name]
+    namespace = {}
+    exec(marshal.loads(code), namespace)
+    return namespace[scope_name]
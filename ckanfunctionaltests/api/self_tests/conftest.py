@@ -0,0 +1,16 @@
+import pytest
+
+from ckanfunctionaltests.api import fastjsonschema, set_fast_validation
+
+
+@pytest.fixture(params=(False, True,), ids=("jsonschema", "fast",))
+def validation_engine(request, fast_validation):
+    """
+    Run a test both with and without the compiled fast validation path, restoring the run's
+    configured choice afterwards
+    """
+    if request.param and fastjsonschema is None:
+        pytest.skip("fastjsonschema not installed")
+    set_fast_validation(request.param)
+    yield request.param
+    set_fast_validation(fast_validation)
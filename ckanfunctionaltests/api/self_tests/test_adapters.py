@@ -0,0 +1,207 @@
+from collections import Counter
+
+import pytest
+from requests import Session
+from requests.adapters import BaseAdapter
+
+from ckanfunctionaltests.api import adapters
+from ckanfunctionaltests.api.adapters import CachingAdapter, RateLimitedAdapter, TokenBucket, build_response
+from ckanfunctionaltests.api.cassette import CassetteAdapter, CassetteMiss, CassetteStore
+
+
+class CountingAdapter(BaseAdapter):
+    "Responds to every request with its own url, counting the requests received"
+    def __init__(self, status=200):
+        super().__init__()
+        self.status = status
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request.url)
+        return build_response(
+            request,
+            self.status,
+            "Whatever",
+            {"content-type": "application/json"},
+            f'{{"url": "{request.url}"}}'.encode("utf-8"),
+        )
+
+    def close(self):
+        pass
+
+
+def _session(adapter):
+    session = Session()
+    session.mount("http://", adapter)
+    return session
+
+
+class FakeClock:
+    "Stands in for monotonic & sleep, sleeping advancing the time only if ``advance`` is set"
+    def __init__(self, advance=True):
+        self.now = 100.
+        self.advance = advance
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        if self.advance:
+            self.now += seconds
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(adapters, "monotonic", clock.monotonic)
+    monkeypatch.setattr(adapters, "sleep", clock.sleep)
+    return clock
+
+
+class TestTokenBucket:
+    def test_burst(self, clock):
+        bucket = TokenBucket(2., 3.)
+        assert [bucket.acquire() for _ in range(3)] == [0., 0., 0.]
+        assert clock.sleeps == []
+
+        # the burst used up, further requests must wait for the bucket to refill
+        assert bucket.acquire() == .5
+        assert bucket.acquire() == .5
+        assert clock.sleeps == [.5, .5]
+
+    def test_refill(self, clock):
+        bucket = TokenBucket(2., 3.)
+        for _ in range(3):
+            bucket.acquire()
+
+        clock.now += 1.
+        assert [bucket.acquire() for _ in range(2)] == [0., 0.]
+        assert bucket.acquire() == .5
+
+    def test_refill_capped_at_capacity(self, clock):
+        bucket = TokenBucket(2., 3.)
+        clock.now += 100.
+        assert [bucket.acquire() for _ in range(3)] == [0., 0., 0.]
+        assert bucket.acquire() == .5
+
+    def test_queued_callers(self, clock):
+        # as if each of these acquisitions were made by a different thread, none of which has
+        # finished sleeping before the next arrives: each reserves the next place in the queue
+        clock.advance = False
+        bucket = TokenBucket(2., 1.)
+        assert [bucket.acquire() for _ in range(4)] == [0., .5, 1., 1.5]
+
+        # once time has caught up with those reservations the bucket starts refilling again
+        clock.now += 1.5
+        assert bucket.acquire() == .5
+
+
+def test_rate_limited_adapter(clock):
+    inner = CountingAdapter()
+    session = _session(RateLimitedAdapter(inner, TokenBucket(1., 2.)))
+
+    for path in ("a", "b", "c",):
+        assert session.get(f"http://example.com/{path}").status_code == 200
+
+    assert len(inner.requests) == 3
+    assert clock.sleeps == [1.]
+
+
+class TestCachingAdapter:
+    def test_lru(self):
+        inner = CountingAdapter()
+        stats = Counter()
+        session = _session(CachingAdapter(inner, 2, stats))
+
+        for path in ("a", "b", "a", "c", "b", "a",):
+            assert session.get(f"http://example.com/{path}").json() == {"url": f"http://example.com/{path}"}
+
+        assert inner.requests == [f"http://example.com/{path}" for path in ("a", "b", "c", "b", "a",)]
+        assert stats == {"response_cache_hits": 1, "response_cache_misses": 5}
+
+    def test_normalised_params(self):
+        inner = CountingAdapter()
+        session = _session(CachingAdapter(inner, 10, Counter()))
+
+        session.get("http://example.com/x?a=1&b=2")
+        assert session.get("http://Example.com/x?b=2&a=1").status_code == 200
+        assert len(inner.requests) == 1
+
+    def test_stream_uncached(self):
+        inner = CountingAdapter()
+        session = _session(CachingAdapter(inner, 10, Counter()))
+
+        session.get("http://example.com/x", stream=True)
+        session.get("http://example.com/x", stream=True)
+        assert len(inner.requests) == 2
+
+    def test_server_error_uncached(self):
+        inner = CountingAdapter(status=500)
+        session = _session(CachingAdapter(inner, 10, Counter()))
+
+        session.get("http://example.com/x")
+        assert session.get("http://example.com/x").status_code == 500
+        assert len(inner.requests) == 2
+
+
+class TestCassetteAdapter:
+    def test_record_replay(self, tmp_path):
+        store = CassetteStore(str(tmp_path))
+        recording_session = _session(CassetteAdapter(CountingAdapter(), store, "record"))
+        assert recording_session.get("http://example.com/x?b=2&a=1").status_code == 200
+
+        replay_inner = CountingAdapter()
+        replaying_session = _session(CassetteAdapter(replay_inner, store, "replay"))
+        # host & parameter order should be irrelevant
+        response = replaying_session.get("http://elsewhere.com/x?a=1&b=2")
+        assert response.status_code == 200
+        assert response.reason == "Whatever"
+        assert response.json() == {"url": "http://example.com/x?b=2&a=1"}
+        assert replay_inner.requests == []
+
+    def test_record_streamed(self, tmp_path):
+        store = CassetteStore(str(tmp_path))
+        recording_session = _session(CassetteAdapter(CountingAdapter(), store, "record"))
+        response = recording_session.get("http://example.com/x", stream=True)
+        key = "GET /x"
+
+        # the body should still arrive in pieces, only being stored once it's all been read
+        chunks = response.iter_content(4)
+        first_chunk = next(chunks)
+        assert first_chunk == b'{"ur'
+        assert store.get(key) is None
+        assert first_chunk + b"".join(chunks) == b'{"url": "http://example.com/x"}'
+        assert store.get(key)["body"] == b'{"url": "http://example.com/x"}'
+
+    def test_record_abandoned_stream(self, tmp_path):
+        store = CassetteStore(str(tmp_path))
+        recording_session = _session(CassetteAdapter(CountingAdapter(), store, "record"))
+        response = recording_session.get("http://example.com/x", stream=True)
+        next(response.iter_content(4))
+        with pytest.warns(UserWarning, match="Not recording 'GET /x'"):
+            response.close()
+
+        assert store.get("GET /x") is None
+
+    def test_record_read_to_end_closed(self, tmp_path):
+        store = CassetteStore(str(tmp_path))
+        recording_session = _session(CassetteAdapter(CountingAdapter(), store, "record"))
+        response = recording_session.get("http://example.com/x", stream=True)
+        body = b'{"url": "http://example.com/x"}'
+        # exactly the whole body, without the final empty read that would show it had ended
+        assert response.raw.read(len(body)) == body
+        assert store.get("GET /x") is None
+        response.close()
+
+        assert store.get("GET /x")["body"] == body
+
+    def test_replay_miss(self, tmp_path):
+        session = _session(CassetteAdapter(CountingAdapter(), CassetteStore(str(tmp_path)), "replay"))
+        with pytest.raises(CassetteMiss):
+            session.get("http://example.com/x")
+
+    def test_unknown_mode(self, tmp_path):
+        with pytest.raises(ValueError):
+            CassetteAdapter(CountingAdapter(), CassetteStore(str(tmp_path)), "rewind")
@@ -6,8 +6,13 @@ import pytest
 from ckanfunctionaltests.api.comparisons import (
     RestrictedAny,
     AnySupersetOf,
+    AnySupersetOfPlan,
     AnyStringMatching,
     ExactIdentity,
+    _complete_matching,
+    comparison_stats,
+    find_matches,
+    format_path,
 )
 
 
@@ -303,6 +308,299 @@ class TestAnySupersetOf:
             ],
         }, recursive=recursive, seq_norm_order=seq_norm_order)
 
+    def test_norm_order_greedy_insufficient(self):
+        # the first subset item would be greedily matched with the only superset item the
+        # second can equal
+        assert [
+            {"a": 1, "b": 2},
+            {"a": 1},
+        ] == AnySupersetOf([
+            {"a": 1},
+            {"a": 1, "b": 2},
+        ], recursive=True, seq_norm_order=True)
+
+    def test_norm_order_duplicates(self):
+        assert ["b", "a", "b"] == AnySupersetOf(["b", "b"], seq_norm_order=True)
+        assert ["b", "a", "c"] != AnySupersetOf(["b", "b"], seq_norm_order=True)
+        assert [
+            {"name": "x", "v": 1},
+            {"name": "y"},
+            {"name": "x", "v": 2},
+        ] == AnySupersetOf([
+            {"name": "x", "v": 2},
+            {"name": "x"},
+        ], recursive=True, seq_norm_order=True)
+        assert [
+            {"name": "x", "v": 1},
+            {"name": "y", "v": 2},
+        ] != AnySupersetOf([
+            {"name": "x"},
+            {"name": "x"},
+        ], recursive=True, seq_norm_order=True)
+
+    def test_norm_order_keyed(self):
+        # the subset item's "name" should still be found although the superset item also has a "key"
+        assert [
+            {"key": "k", "name": "n", "v": 1},
+            {"key": "j", "name": "m", "v": 2},
+        ] == AnySupersetOf([
+            {"name": "m", "v": 2},
+        ], recursive=True, seq_norm_order=True)
+        assert [
+            {"key": "k", "name": "n", "v": 1},
+            {"key": "j", "name": "m", "v": 2},
+        ] != AnySupersetOf([
+            {"name": "m", "v": 1},
+        ], recursive=True, seq_norm_order=True)
+
+    def test_norm_order_superset_restricted_any(self):
+        assert [
+            3,
+            RestrictedAny(lambda x: x == "foo"),
+        ] == AnySupersetOf(["foo", 3], seq_norm_order=True)
+        assert [
+            {"name": "bar"},
+            RestrictedAny(lambda x: x == {"name": "foo"}),
+        ] == AnySupersetOf([{"name": "foo"}], seq_norm_order=True)
+
+
+class TestAnySupersetOfPlan:
+    expected = {
+        "a": 123,
+        "b": [
+            "baz",
+            {
+                "321": {
+                    "y": ["r", "b"],
+                    "x": 456,
+                },
+                "key": "abc",
+            },
+            "d",
+        ],
+        "c": {"d": {"e": None}},
+    }
+
+    @pytest.mark.parametrize("seq_norm_order", (False, True,))
+    @pytest.mark.parametrize("recursive", (False, True,))
+    @pytest.mark.parametrize("value", (
+        expected,
+        {
+            "a": 123,
+            "b": [
+                {"321": {"x": 456, "y": ["a", "b", "r"]}, "key": "abc", "654": [1]},
+                "e",
+                "d",
+                "baz",
+            ],
+            "c": {"d": {"e": None, "f": 1}},
+            "less": "predictabananas",
+        },
+        {
+            "a": 123,
+            "b": ["baz", {"321": {"x": 456, "y": ["r", "b"]}, "key": "abc"}, "d"],
+            "c": {"d": {}},
+        },
+        {"a": 123, "c": {"d": {"e": None}}},
+        [expected],
+    ))
+    def test_equivalence(self, value, recursive, seq_norm_order):
+        assert (value == AnySupersetOfPlan(self.expected, recursive=recursive, seq_norm_order=seq_norm_order)) == (
+            value == AnySupersetOf(self.expected, recursive=recursive, seq_norm_order=seq_norm_order)
+        )
+
+    def test_cached(self):
+        expected = {"a": [{"b": 1}], "c": 2}
+        plan = AnySupersetOfPlan(expected, recursive=True)
+        assert AnySupersetOfPlan({"c": 2, "a": [{"b": 1}]}, recursive=True) is plan
+        assert AnySupersetOfPlan(expected, recursive=True, seq_norm_order=True) is not plan
+
+        # changes to the original shouldn't affect the cached plan
+        expected["c"] = 3
+        assert AnySupersetOfPlan(expected, recursive=True) is not plan
+        assert {"a": [{"b": 1}], "c": 2} == plan
+
+    def test_uncacheable(self):
+        expected = {"a": ANY, 1: 2}
+        assert AnySupersetOfPlan(expected) is not AnySupersetOfPlan(expected)
+        assert {"a": 3, 1: 2, 4: 5} == AnySupersetOfPlan(expected)
+
+    def test_mismatch_path(self):
+        plan = AnySupersetOfPlan({"a": {"b": [{"name": "x", "c": {"d": 1}}]}}, recursive=True, seq_norm_order=True)
+        assert {"a": {"b": [{"name": "x", "c": {"d": 2}}]}} != plan
+        assert plan.mismatch.path == ("a", "b", 0, "c", "d",)
+        assert {"a": {"c": []}} != plan
+        assert plan.mismatch.path == ("a", "b",)
+        assert plan.mismatch.reason == "missing key"
+
+
+class TestMismatch:
+    def test_format_path(self):
+        assert format_path(("resources", 3, "format",)) == "resources[3].format"
+        assert format_path((0, "a b", 321,)) == "[0]['a b'][321]"
+        assert format_path(()) == "(top level)"
+
+    def test_nested_path(self):
+        matcher = AnySupersetOf({
+            "a": {"b": [{"name": "x", "format": "CSV"}]},
+        }, recursive=True, seq_norm_order=True)
+        assert {"a": {"b": [{"name": "y"}, {"name": "x", "format": "csv"}]}} != matcher
+        assert matcher.mismatch.path == ("a", "b", 1, "format",)
+        assert matcher.mismatch.expected == "CSV"
+        assert matcher.mismatch.actual == "csv"
+        assert matcher.describe_mismatch()[0] == "mismatch at a.b[1].format: not equal"
+
+    def test_missing_key(self):
+        matcher = AnySupersetOf({"a": [{"b": 1}]}, recursive=True)
+        assert {"a": [{"c": 1}]} != matcher
+        assert matcher.mismatch.path == ("a",)
+        assert "expected item 0" in matcher.mismatch.reason
+
+        matcher = AnySupersetOf({"a": {"b": 1}}, recursive=True)
+        assert {"a": {"c": 1}} != matcher
+        assert matcher.mismatch.path == ("a", "b",)
+        assert matcher.mismatch.reason == "missing key"
+
+    def test_reset_on_match(self):
+        matcher = AnySupersetOf({"a": 1})
+        assert {"a": 2} != matcher
+        assert matcher.describe_mismatch() is not None
+        assert {"a": 1} == matcher
+        assert matcher.describe_mismatch() is None
+
+
+class TestCompleteMatching:
+    def test_long_augmenting_path(self):
+        # a greedy matching of each subset item to the first of its candidates leaves the last one unmatched, the
+        # only augmenting path running through every other item - far deeper than the recursion limit allows
+        n = 5000
+        adjacency = [(i, i + 1,) for i in range(n - 1)] + [(0,)]
+        match_sub = list(range(n - 1)) + [None]
+        match_super = {j: j for j in range(n - 1)}
+
+        assert _complete_matching(adjacency, match_sub, match_super)
+        assert match_sub == [i + 1 for i in range(n - 1)] + [0]
+        assert match_super == {j: i for i, j in enumerate(match_sub)}
+
+    def test_incomplete(self):
+        adjacency = [(0, 1,), (0,), (0,)]
+        match_sub = [0, None, None]
+        match_super = {0: 0}
+
+        assert not _complete_matching(adjacency, match_sub, match_super)
+        # still a maximum matching
+        assert sum(j is not None for j in match_sub) == 2
+        assert all(j in adjacency[i] and match_super[j] == i for i, j in enumerate(match_sub) if j is not None)
+
+
+class TestFindMatches:
+    items = (
+        {"id": "1", "name": "a", "resources": [{"position": 0, "format": "CSV"}]},
+        {"id": "2", "name": "b", "resources": [{"position": 0, "format": "XLS"}]},
+        {"id": "3", "name": "b", "resources": [{"position": 0, "format": "CSV"}]},
+        "not a mapping",
+        {"id": "4", "name": "b", "resources": [{"position": 0, "format": "CSV"}], "extra": True},
+    )
+
+    def test_matcher(self):
+        matcher = AnySupersetOf({"name": "b", "resources": [{"format": "CSV"}]}, recursive=True, seq_norm_order=True)
+        result = find_matches(matcher, self.items)
+        assert result.indices == (2, 4,)
+        assert tuple(result.near_misses) == (1,)
+        assert result.near_misses[1].path == ("resources",)
+
+    def test_plan(self):
+        plan = AnySupersetOfPlan(
+            {"id": "2", "resources": [{"position": 0, "format": "CSV"}]},
+            recursive=True,
+            seq_norm_order=True,
+        )
+        result = find_matches(plan, self.items)
+        assert result.indices == ()
+        assert result.near_misses[1].path == ("resources", 0, "format",)
+        assert result.describe_near_misses() == [
+            "item 1: mismatch at resources[0].format: not equal (expected 'CSV', actual 'XLS')",
+        ]
+
+    def test_plain(self):
+        result = find_matches(dict(self.items[2], extra=True), self.items)
+        assert result.indices == ()
+        assert result.near_misses[2].path == ("extra",)
+        assert result.near_misses[2].reason == "missing key"
+
+    def test_unindexed(self):
+        # with nothing to filter on, every item has to be compared
+        result = find_matches(AnySupersetOf({"resources": [{"format": "CSV"}]}, recursive=True), self.items)
+        assert result.indices == (0, 2, 4,)
+        assert tuple(result.near_misses) == (1, 3,)
+        assert find_matches("not a mapping", self.items).indices == (3,)
+
+
+class TestMatchKeys:
+    def test_match_fields_by_parent(self):
+        resources = [{"position": i, "name": "same", "format": f"F{i}"} for i in range(3)]
+        matcher = AnySupersetOf({"resources": resources[::-1]}, recursive=True, seq_norm_order=True)
+        assert matcher._subset_dict["resources"]._match_keys == (
+            ("position", 2,),
+            ("position", 1,),
+            ("position", 0,),
+        )
+        before = comparison_stats.copy()
+        assert {"resources": resources} == matcher
+        assert comparison_stats["match_key_position"] - before["match_key_position"] == 3
+        assert comparison_stats["match_key_name"] == before["match_key_name"]
+
+        # elsewhere the default preference applies
+        matcher = AnySupersetOf({"other": resources}, recursive=True, seq_norm_order=True)
+        assert matcher._subset_dict["other"]._match_keys[0] == ("name", "same",)
+
+    def test_index_reused(self):
+        tags = [{"name": "a"}, {"name": "b"}]
+        matcher = AnySupersetOf(
+            [{"id": 1, "tags": [{"name": "a"}]}, {"id": 2, "tags": [{"name": "b"}]}],
+            recursive=True,
+            seq_norm_order=True,
+        )
+        before = comparison_stats.copy()
+        # both expected items are compared with both items sharing the same tags list
+        assert [{"id": 2, "tags": tags}, {"id": 1, "tags": tags}] == matcher
+        assert comparison_stats["superset_indices_reused"] - before["superset_indices_reused"] == 1
+
+    def test_sequence_key_values_unused(self):
+        # a (hashable) tuple under a key can equal a longer sequence when compared recursively, so can't be bucketed
+        matcher = AnySupersetOf([{"name": ("a",), "x": 1}], recursive=True, seq_norm_order=True)
+        assert matcher._match_keys == (None,)
+        assert [{"name": ["a", "b"], "x": 1}] == matcher
+        assert [{"name": ("a", "b",), "x": 1}] == matcher
+        assert [{"name": ("b",), "x": 1}] != matcher
+
+        # likewise on the superset's side, where a scalar key is used
+        matcher = AnySupersetOf([{"name": "a", "x": 1}], recursive=True, seq_norm_order=True)
+        assert [{"name": ("a",), "x": 1}, {"name": "a", "x": 1}] == matcher
+        assert [{"name": ("a",), "x": 1}] != matcher
+
+
+class TestMemoisation:
+    def test_repeated_candidate(self):
+        item = {"a": {"b": 1}, "c": 2}
+        matcher = AnySupersetOf([{"a": {"b": 2}}], recursive=True)
+        before = comparison_stats.copy()
+
+        assert [item, item, item] != matcher
+        # the nested matcher should only have had to be compared with item once
+        assert comparison_stats["comparisons"] - before["comparisons"] == 2
+        assert comparison_stats["comparisons_memoised"] - before["comparisons_memoised"] == 2
+        # the nested matcher's mismatch should have been restored along with its memoised result
+        assert matcher._subset_seq[0].mismatch.path == ("a", "b",)
+
+    def test_memo_per_comparison(self):
+        item = {"a": {"b": 1}}
+        matcher = AnySupersetOf({"x": {"a": {"b": 1}}}, recursive=True)
+        assert {"x": item} == matcher
+        before = comparison_stats.copy()
+        assert {"x": item} == matcher
+        assert comparison_stats["comparisons_memoised"] == before["comparisons_memoised"]
+
 
 class TestStringMatching:
     def test_string_matching(self):
@@ -0,0 +1,77 @@
+from copy import deepcopy
+import time
+import tracemalloc
+
+import pytest
+
+from ckanfunctionaltests.api import comparisons, get_example_response
+from ckanfunctionaltests.api.comparisons import AnySupersetOf
+
+
+def _unslotted(cls):
+    "A subclass of ``cls`` whose instances have a __dict__, as matchers used to"
+    return type(f"Unslotted{cls.__name__}", (cls,), {})
+
+
+def _measure(expected, repeats=5):
+    "Returns the memory held by a matcher tree built from ``expected`` and the mean time taken to build one"
+    # warm up any one-off allocations so they aren't counted
+    AnySupersetOf(expected, recursive=True, seq_norm_order=True)
+
+    tracemalloc.start()
+    try:
+        matcher = AnySupersetOf(expected, recursive=True, seq_norm_order=True)
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        AnySupersetOf(expected, recursive=True, seq_norm_order=True)
+    return matcher, size, (time.perf_counter() - start) / repeats
+
+
+def test_slotted_matcher_memory(monkeypatch, record_property):
+    """
+    Guards the memory saved by matchers using __slots__: a matcher tree for a large organization should take less
+    memory than one built from matchers carrying a __dict__. Construction times are only recorded (as properties of
+    the test, e.g. in a junitxml report) for information, not asserted on, being too noisy to compare reliably.
+    """
+    expected = get_example_response("stable/organization_show_with_datasets.inner.test.json")
+    # scale up to the sort of organization that makes this matter
+    expected["packages"] = [
+        {**deepcopy(package), "name": f"{package['name']}-{i}"}
+        for i in range(50)
+        for package in expected["packages"]
+    ]
+
+    slotted_matcher, slotted_size, slotted_time = _measure(expected)
+
+    # build the same tree using matchers that each carry a __dict__
+    monkeypatch.setattr(comparisons, "AnySupersetOfMapping", _unslotted(comparisons.AnySupersetOfMapping))
+    monkeypatch.setattr(comparisons, "AnySupersetOfSeq", _unslotted(comparisons.AnySupersetOfSeq))
+    unslotted_matcher, unslotted_size, unslotted_time = _measure(expected)
+    assert hasattr(unslotted_matcher, "__dict__")
+    assert not hasattr(slotted_matcher, "__dict__")
+
+    for name, value in (
+        ("slotted_bytes", slotted_size),
+        ("unslotted_bytes", unslotted_size),
+        ("slotted_seconds", slotted_time),
+        ("unslotted_seconds", unslotted_time),
+    ):
+        record_property(name, value)
+
+    assert slotted_size < unslotted_size
+
+
+@pytest.mark.parametrize("matcher", (
+    comparisons.RestrictedAny(bool),
+    comparisons.AnySupersetOf({"a": 1}),
+    comparisons.AnySupersetOf([1]),
+    comparisons.AnySupersetOfPlan({"a": [{"b": 1}]}, recursive=True),
+    comparisons.AnyStringMatching("a"),
+    comparisons.ExactIdentity(None),
+), ids=lambda matcher: type(matcher).__name__)
+def test_no_instance_dict(matcher):
+    assert not hasattr(matcher, "__dict__")
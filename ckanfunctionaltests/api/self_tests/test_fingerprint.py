@@ -0,0 +1,65 @@
+import pytest
+
+from ckanfunctionaltests.api.fingerprint import RollingFingerprint
+
+
+def _fingerprint(items, page_sizes):
+    fingerprint = RollingFingerprint()
+    start = 0
+    for page_size in page_sizes:
+        fingerprint.update(items[start:start+page_size])
+        start += page_size
+    return fingerprint
+
+
+_items = [{"name": f"pkg-{i}", "tags": [i, str(i)], "n": i * 1.5} for i in range(111)]
+
+
+def test_equal_regardless_of_paging():
+    a = _fingerprint(_items, (1, 10, 100,))
+    b = _fingerprint(_items, (111,))
+
+    assert len(a) == len(b) == 111
+    assert a.digest == b.digest
+    assert a.first_difference(b) is None
+    assert len(a.pages) == 3
+
+
+def test_key_order_insensitive():
+    a = _fingerprint([{"a": 1, "b": 2}], (1,))
+    b = _fingerprint([{"b": 2, "a": 1}], (1,))
+    assert a.first_difference(b) is None
+
+
+@pytest.mark.parametrize("index", (0, 1, 10, 57, 110,))
+def test_first_difference(index):
+    altered = list(_items)
+    altered[index] = {"name": "something else"}
+
+    a = _fingerprint(_items, (1, 10, 100,))
+    b = _fingerprint(altered, (1, 10, 100,))
+
+    assert a.first_difference(b) == index
+    assert b.first_difference(a) == index
+    assert a.page_of(index) == next(page for page in a.pages if page[0] <= index < page[1])
+    assert a.page_of(index)[2] != b.page_of(index)[2]
+
+
+def test_order_sensitive():
+    swapped = list(_items)
+    swapped[20], swapped[30] = swapped[30], swapped[20]
+
+    assert _fingerprint(_items, (111,)).first_difference(_fingerprint(swapped, (111,))) == 20
+
+
+def test_prefix():
+    a = _fingerprint(_items, (1, 10, 100,))
+    b = _fingerprint(_items[:50], (1, 10, 39,))
+
+    assert a.first_difference(b) == 50
+    assert b.first_difference(a) == 50
+
+
+def test_empty():
+    assert RollingFingerprint().first_difference(RollingFingerprint()) is None
+    assert RollingFingerprint().first_difference(_fingerprint(_items, (5,))) == 0
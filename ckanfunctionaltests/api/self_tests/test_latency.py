@@ -0,0 +1,328 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+from threading import Thread
+
+import pytest
+from requests import Session
+from requests.adapters import BaseAdapter
+
+from ckanfunctionaltests.api.adapters import build_response
+from ckanfunctionaltests.api.latency import (
+    LatencyRecorder,
+    LatencyRecordingAdapter,
+    LatencySample,
+    TimedHTTPAdapter,
+    check_latency_budgets,
+    get_endpoint,
+    parse_latency_budgets,
+    percentile,
+)
+
+
+class StoredResponseAdapter(BaseAdapter):
+    "Responds to every request with a stored body, as a cached or replayed response would be"
+    def __init__(self, status=200, body=b'{"result": "whatever"}'):
+        super().__init__()
+        self.status = status
+        self.body = body
+
+    def send(self, request, **kwargs):
+        return build_response(request, self.status, "Whatever", {"content-type": "application/json"}, self.body)
+
+    def close(self):
+        pass
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = json.dumps({"path": self.path}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture()
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _session(adapter):
+    session = Session()
+    session.mount("http://", adapter)
+    return session
+
+
+@pytest.mark.parametrize("method,url,expected", (
+    ("GET", "http://x/api/3/action/package_search?q=a&rows=10", "GET /api/3/action/package_search?q&rows"),
+    ("GET", "http://x/api/3/action/package_search?rows=1&q=b&q=c", "GET /api/3/action/package_search?q&rows"),
+    (
+        "GET",
+        "http://x/api/action/organization_show?id=foo&include_datasets=1",
+        "GET /api/action/organization_show?id&include_datasets",
+    ),
+    (
+        "GET",
+        "http://x/api/2/rest/harvestobject/A18D2811-13b0-4838-8bfb-5793433317b9/xml",
+        "GET /api/2/rest/harvestobject/{id}/xml",
+    ),
+    ("HEAD", "http://x/api/action/package_list", "HEAD /api/action/package_list"),
+))
+def test_get_endpoint(method, url, expected):
+    assert get_endpoint(method, url) == expected
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) is None
+
+
+def test_recorder_merge_and_summarise(tmp_path):
+    worker_a = LatencyRecorder()
+    worker_b = LatencyRecorder()
+    for i in range(1, 51):
+        worker_a.record("GET /a", LatencySample(0., i / 1000, i / 500, 1024, 200))
+        worker_b.record("GET /a", LatencySample(0.01 if i == 1 else 0., (i + 50) / 1000, (i + 50) / 500, 2048, 200))
+    worker_b.record("GET /b", LatencySample(0., 0.1, 0.2, 10, 500))
+
+    controller = LatencyRecorder()
+    for worker in (worker_a, worker_b,):
+        # via a round trip through json, roughly as they'd be sent from xdist workers
+        controller.merge(json.loads(json.dumps(worker.to_dict())))
+
+    summary = controller.summarise()
+    assert list(summary) == ["GET /a", "GET /b"]
+    assert summary["GET /a"]["count"] == 100
+    assert summary["GET /a"]["new_connections"] == 1
+    assert summary["GET /a"]["statuses"] == {"200": 100}
+    assert summary["GET /a"]["ttfb"] == {"p50": 0.05, "p95": 0.095, "p99": 0.099, "max": 0.1}
+    assert summary["GET /a"]["total"]["p50"] == 0.1
+    assert summary["GET /a"]["size"] == {"mean": 1536, "max": 2048}
+    assert summary["GET /b"]["statuses"] == {"500": 1}
+
+    report_path = tmp_path / "report.json"
+    controller.write_report(str(report_path))
+    assert json.loads(report_path.read_text()) == {"endpoints": summary}
+
+    table = list(controller.format_table())
+    assert len(table) == 3
+    assert table[1].split()[:5] == ["GET", "/a", "100", "50.0", "95.0"]
+
+
+@pytest.mark.parametrize("stream", (False, True,))
+def test_recording_adapter_stored_response(stream):
+    recorder = LatencyRecorder()
+    session = _session(LatencyRecordingAdapter(StoredResponseAdapter(404), recorder))
+
+    response = session.get("http://example.com/api/action/package_show?id=x", stream=stream)
+    if stream:
+        # nothing is recorded until the body has been read
+        assert recorder.samples == {}
+        assert b"".join(response.iter_content(4)) == b'{"result": "whatever"}'
+    else:
+        assert response.json() == {"result": "whatever"}
+
+    (sample,) = recorder.samples["GET /api/action/package_show?id"]
+    assert sample.status == 404
+    assert sample.size == len(b'{"result": "whatever"}')
+    assert sample.connect == 0
+    assert 0 <= sample.ttfb <= sample.total
+
+
+def test_recording_adapter_connections(server_url):
+    recorder = LatencyRecorder()
+    session = _session(LatencyRecordingAdapter(TimedHTTPAdapter(), recorder))
+
+    for i in range(3):
+        assert session.get(f"{server_url}/api/action/package_list?offset={i}").json() == {
+            "path": f"/api/action/package_list?offset={i}",
+        }
+
+    samples = recorder.samples["GET /api/action/package_list?offset"]
+    assert len(samples) == 3
+    # only the first request should have had to establish a connection
+    assert samples[0].connect > 0
+    assert [sample.connect for sample in samples[1:]] == [0, 0]
+    assert all(sample.status == 200 and sample.size > 0 for sample in samples)
+
+
+def test_parse_latency_budgets():
+    budgets = parse_latency_budgets({"action/package_search": {"p95": 2000, "ttfb_max": 500}})
+    assert [(budget.pattern.pattern, budget.timing, budget.statistic, budget.limit) for budget in budgets] == [
+        ("action/package_search", "total", "p95", 2.),
+        ("action/package_search", "ttfb", "max", .5),
+    ]
+
+    with pytest.raises(ValueError):
+        parse_latency_budgets({"action/package_search": {"p90": 2000}})
+
+
+def test_check_latency_budgets(tmp_path):
+    recorder = LatencyRecorder()
+    for i in range(1, 21):
+        recorder.record("GET /api/action/package_search?q", LatencySample(0., i / 100, i / 10, 10, 200))
+    recorder.record("GET /api/action/package_list", LatencySample(0., 0.1, 0.2, 10, 200))
+    recorder.record("GET /api/action/package_show?id", LatencySample(0., 5., 10., 10, 200))
+
+    budgets = parse_latency_budgets({
+        # p95 is 1.9s, max 2s
+        "action/package_search": {"p95": 1900, "max": 1999, "ttfb_p95": 100},
+        "action/package_(list|search)": {"p50": 1000},
+    })
+    assert check_latency_budgets(budgets, recorder.summarise()) == [
+        "GET /api/action/package_search?q: total max of 2000ms exceeds budget of 1999ms (20 requests)",
+        "GET /api/action/package_search?q: ttfb p95 of 190ms exceeds budget of 100ms (20 requests)",
+    ]
+
+    report_path = tmp_path / "report.json"
+    recorder.write_report(str(report_path), budgets)
+    assert len(json.loads(report_path.read_text())["budget_violations"]) == 2
+
+
+def test_recorder_since_checkpoint():
+    recorder = LatencyRecorder()
+    recorder.record("GET /a", LatencySample(0., 1., 1., 10, 200))
+    checkpoint = recorder.checkpoint()
+    assert recorder.since(checkpoint).samples == {}
+
+    recorder.record("GET /a", LatencySample(0., 2., 2., 10, 200))
+    recorder.record("GET /b", LatencySample(0., 3., 3., 10, 200))
+    assert recorder.since(checkpoint).samples == {
+        "GET /a": [LatencySample(0., 2., 2., 10, 200)],
+        "GET /b": [LatencySample(0., 3., 3., 10, 200)],
+    }
+    assert len(recorder.samples["GET /a"]) == 2
+
+
+_budget_test_module = """
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+import time
+
+import pytest
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith("/slow"):
+            time.sleep(.2)
+        self.send_response(200)
+        self.send_header("content-length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+
+@pytest.fixture(scope="session")
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture()
+def slow_fixture(rsession, server_url):
+    # fixtures' requests aren't charged to the test
+    rsession.get(f"{server_url}/slow-fixture")
+
+
+@pytest.mark.latency_budget({"slow": {"max": 50}})
+def test_marked_over(rsession, server_url):
+    rsession.get(f"{server_url}/slow")
+
+
+@pytest.mark.latency_budget({"slow": {"max": 5000}})
+def test_marked_within(rsession, server_url, slow_fixture):
+    rsession.get(f"{server_url}/slow")
+
+
+@pytest.mark.latency_budget
+def test_marked_configured(rsession, server_url, slow_fixture):
+    rsession.get(f"{server_url}/fast")
+
+
+def test_unmarked(rsession, server_url):
+    rsession.get(f"{server_url}/slow")
+"""
+
+
+@pytest.fixture()
+def budget_testdir(testdir, monkeypatch):
+    # the subprocess should import this copy of the package
+    package_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join(filter(None, (package_root, os.environ.get("PYTHONPATH")))))
+    testdir.makeconftest('pytest_plugins = ["ckanfunctionaltests.api.conftest"]')
+    testdir.makepyfile(test_budgets=_budget_test_module)
+    return testdir
+
+
+def _run_budget_tests(testdir, *args, **variables):
+    variables_path = testdir.tmpdir.join("variables.json")
+    variables_path.write(json.dumps({
+        "api_user_agent": "ckan-functional-tests",
+        "http_retries": 0,
+        "record_latency": True,
+        "latency_budgets": {"slow": {"p50": 100}, "fast": {"max": 5000}},
+        **variables,
+    }))
+    return testdir.runpytest_subprocess("--variables", str(variables_path), *args)
+
+
+def test_marked_tests_budgets(budget_testdir):
+    result = _run_budget_tests(budget_testdir, "-k", "marked and not unmarked")
+    result.assert_outcomes(passed=2, failed=1)
+    result.stdout.fnmatch_lines([
+        "*test_marked_over*",
+        "Latency budget exceeded:",
+        "  GET /slow: total max of *ms exceeds budget of 50ms (1 requests)",
+    ])
+
+
+@pytest.mark.parametrize("fail,xdist_args", (
+    (False, (),),
+    (True, (),),
+    # the samples being gathered from the workers to be checked
+    (True, ("-n", "2",),),
+), ids=("warn", "fail", "fail-xdist",))
+def test_run_budgets(budget_testdir, fail, xdist_args):
+    result = _run_budget_tests(budget_testdir, "-k", "unmarked", *xdist_args, fail_latency_budgets=fail)
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines([
+        "latency budgets exceeded over the run" + (" (failing it):" if fail else ":"),
+        "  GET /slow: total p50 of *ms exceeds budget of 100ms (1 requests)",
+    ])
+    assert result.ret == (1 if fail else 0)
+
+
+def test_budgets_without_recording(budget_testdir):
+    result = _run_budget_tests(budget_testdir, "-k", "marked_within or unmarked", record_latency=False)
+    result.assert_outcomes(passed=1, failed=1)
+    result.stdout.fnmatch_lines([
+        "*test_marked_within*",
+        "Marked latency_budget, but record_latency is off so no latency was recorded to check",
+    ])
+    result.stdout.fnmatch_lines([
+        "*latency_budgets are configured but record_latency is off, so they won't be checked*",
+    ])
+    result.stdout.no_fnmatch_line("latency budgets exceeded over the run*")
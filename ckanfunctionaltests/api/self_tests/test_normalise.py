@@ -0,0 +1,189 @@
+from copy import deepcopy
+
+import pytest
+
+from ckanfunctionaltests.api import get_example_response
+from ckanfunctionaltests.api.normalise import (
+    NormalisationRules,
+    Normaliser,
+    PlaceholderTemplate,
+    copy_document,
+    normalise,
+)
+
+
+_doc = {
+    "id": "root-id",
+    "name": "<<NAME>>",
+    "revision_id": "r1",
+    "metadata_modified": "2020-01-01",
+    "organization": {"id": "org-id", "title": "<<NAME>> org", "revision_id": "r2"},
+    "extras": [
+        {"key": "harvest_object_id", "value": "h1"},
+        {"key": "licence", "value": "ogl"},
+    ],
+    "resources": [
+        {"id": "res-id", "url": "http://example.com/<<NAME>>/<<PATH>>", "metadata_modified": "<<metadata_modified>>"},
+    ],
+    "tags": ["<<NAME>>", "other"],
+    "<<NAME>>-key": 1,
+}
+
+
+def test_empty_rules_unchanged():
+    doc = deepcopy(_doc)
+    assert normalise(doc) is doc
+    assert doc == _doc
+
+
+def test_remove_keys():
+    doc = normalise(deepcopy(_doc), NormalisationRules(remove_keys=frozenset(("revision_id",))))
+    assert "revision_id" not in doc
+    assert "revision_id" not in doc["organization"]
+    assert doc["organization"]["id"] == "org-id"
+
+
+def test_remove_key_value_items():
+    doc = normalise(deepcopy(_doc), NormalisationRules(remove_key_value_items=frozenset(("harvest_object_id",))))
+    assert doc["extras"] == [{"key": "licence", "value": "ogl"}]
+
+
+def test_placeholders():
+    doc = normalise(deepcopy(_doc), NormalisationRules(
+        placeholder_keys=frozenset(("id", "metadata_modified",)),
+        root_exempt_keys=frozenset(("id",)),
+        key_value_keys=frozenset(("extras",)),
+    ))
+    assert doc["id"] == "root-id"
+    assert doc["metadata_modified"] == "<<metadata_modified>>"
+    assert doc["organization"]["id"] == "<<id>>"
+    assert doc["resources"][0]["id"] == "<<id>>"
+    assert doc["resources"][0]["metadata_modified"] == "<<metadata_modified>>"
+    assert doc["extras"] == [
+        {"key": "harvest_object_id", "value": "<<harvest_object_id-value>>"},
+        {"key": "licence", "value": "<<licence-value>>"},
+    ]
+
+    not_root = normalise(deepcopy(_doc), NormalisationRules(
+        placeholder_keys=frozenset(("id",)),
+        root_exempt_keys=frozenset(("id",)),
+    ), is_root=False)
+    assert not_root["id"] == "<<id>>"
+
+
+def test_collapse_root_key_value_keys():
+    doc = normalise(deepcopy(_doc), NormalisationRules(
+        key_value_keys=frozenset(("extras",)),
+        collapse_root_key_value_keys=True,
+    ))
+    assert doc["extras"] == "<<extras>>"
+
+
+def test_root_list_item_values():
+    doc = normalise(deepcopy(_doc), NormalisationRules(
+        root_list_item_values=(("resources", (("metadata_modified", None),)),),
+    ))
+    assert doc["resources"][0]["metadata_modified"] is None
+    assert doc["metadata_modified"] == "2020-01-01"
+
+
+def test_substitutions():
+    doc = normalise(deepcopy(_doc), NormalisationRules(substitutions=(("NAME", "a-name"), ("PATH", "x/y"))))
+    assert doc["name"] == "a-name"
+    assert doc["organization"]["title"] == "a-name org"
+    assert doc["resources"][0]["url"] == "http://example.com/a-name/x/y"
+    assert doc["resources"][0]["metadata_modified"] == "<<metadata_modified>>"
+    assert doc["tags"] == ["a-name", "other"]
+    assert list(doc)[-1] == "a-name-key"
+    assert list(doc)[:-1] == list(_doc)[:-1]
+
+
+def test_substitution_values_not_resubstituted():
+    normaliser = Normaliser(NormalisationRules(substitutions=(("A", "<<B>>"), ("B", "b"))))
+    assert normaliser("<<A>> <<B>>") == "<<B>> b"
+
+
+def test_combined_rules_equivalent_to_sequential():
+    rules = (
+        NormalisationRules(
+            placeholder_keys=frozenset(("id", "metadata_modified",)),
+            root_exempt_keys=frozenset(("id",)),
+            key_value_keys=frozenset(("extras",)),
+        ),
+        NormalisationRules(substitutions=(("NAME", "a-name"),)),
+        NormalisationRules(
+            remove_keys=frozenset(("revision_id",)),
+            root_list_item_values=(("resources", (("metadata_modified", None),)),),
+        ),
+    )
+
+    sequential = deepcopy(_doc)
+    for rule in rules:
+        normalise(sequential, rule)
+
+    assert normalise(deepcopy(_doc), *rules) == sequential
+
+
+@pytest.mark.parametrize("doc", ("<<NAME>>", 1, None, [1, "<<NAME>>"],))
+def test_non_mapping_docs(doc):
+    assert normalise(deepcopy(doc), NormalisationRules(substitutions=(("NAME", "n"),))) == (
+        [1, "n"] if isinstance(doc, list) else "n" if isinstance(doc, str) else doc
+    )
+
+
+def test_template_names():
+    assert PlaceholderTemplate(_doc).names == frozenset(("NAME", "PATH", "metadata_modified",))
+
+
+def test_template_render():
+    template = PlaceholderTemplate(_doc)
+    original = deepcopy(_doc)
+
+    doc = template.render({"NAME": 'a "quoted" <<PATH>>', "PATH": "x/y"})
+    assert doc["name"] == 'a "quoted" <<PATH>>'
+    assert doc["organization"]["title"] == 'a "quoted" <<PATH>> org'
+    assert doc["resources"][0]["url"] == 'http://example.com/a "quoted" <<PATH>>/x/y'
+    assert doc["resources"][0]["metadata_modified"] == "<<metadata_modified>>"
+    assert doc["tags"] == ['a "quoted" <<PATH>>', "other"]
+    # keys are not indexed
+    assert "<<NAME>>-key" in doc
+
+    assert _doc == original
+    assert template.render({}) == original
+
+
+def test_template_substitute_after_normalisation():
+    template = PlaceholderTemplate(_doc)
+    doc = normalise(template.new(), NormalisationRules(
+        placeholder_keys=frozenset(("url",)),
+        remove_keys=frozenset(("organization",)),
+    ))
+    doc["tags"].pop(0)
+
+    template.substitute(doc, {"NAME": "a-name"})
+    assert doc["name"] == "a-name"
+    assert doc["resources"][0]["url"] == "<<url>>"
+    assert doc["tags"] == ["other"]
+
+
+def test_copy_document():
+    doc = {**_doc, "nested": [[{"a": [1.5, True, None]}]], "other": (1, [2])}
+    copied = copy_document(doc)
+    assert copied == doc
+
+    copied["nested"][0][0]["a"].append(2)
+    copied["organization"]["id"] = "changed"
+    copied["other"][1].append(3)
+    assert doc["nested"] == [[{"a": [1.5, True, None]}]]
+    assert doc["organization"]["id"] == "org-id"
+    assert doc["other"] == (1, [2])
+
+
+def test_get_example_response_safe_to_mutate():
+    response = get_example_response("package_show.json")
+    response["result"]["resources"].clear()
+    response["result"]["name"] = "changed"
+
+    fresh = get_example_response("package_show.json")
+    assert fresh["result"]["resources"]
+    assert fresh["result"]["name"] != "changed"
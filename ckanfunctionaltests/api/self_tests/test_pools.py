@@ -0,0 +1,186 @@
+import json
+import os
+import re
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+from requests import Session
+from requests.adapters import BaseAdapter
+
+from ckanfunctionaltests.api.adapters import build_response
+from ckanfunctionaltests.api.pools import get_harvestobject_id_pool, get_pkg_slug_pool, get_test_random
+
+
+class StubCKANAdapter(BaseAdapter):
+    """
+    Responds to requests for each action in ``results`` with that result, or if it's callable,
+    the result of calling it with the request's parameters
+    """
+    def __init__(self, results):
+        super().__init__()
+        self.results = results
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request.url)
+        action = re.search(r"/action/(\w+)", request.url).group(1)
+        result = self.results[action]
+        if callable(result):
+            result = result(dict(parse_qsl(urlsplit(request.url).query)))
+        return build_response(
+            request,
+            200,
+            "OK",
+            {"content-type": "application/json"},
+            json.dumps({"success": True, "result": result}).encode("utf-8"),
+        )
+
+    def close(self):
+        pass
+
+
+def _stub_session(results):
+    session = Session()
+    session.mount("http://", StubCKANAdapter(results))
+    return session
+
+
+_pkg_names = [f"package-{i}" for i in range(50)] + [
+    "a18d2811-13b0-4838-8bfb-5793433317b9",
+    "some-harvest-source",
+]
+
+
+def test_pkg_slug_pool():
+    session = _stub_session({"package_list": _pkg_names})
+
+    pool = get_pkg_slug_pool(session, "http://example.com/api", 1234, 10)
+    assert len(pool) == len(set(pool)) == 10
+    assert all(name.startswith("package-") for name in pool)
+
+    # the same seed should always choose the same pool
+    assert get_pkg_slug_pool(session, "http://example.com/api", 1234, 10) == pool
+    assert get_pkg_slug_pool(session, "http://example.com/api", 4321, 10) != pool
+
+    # the pool can't be larger than the suitable names available
+    assert sorted(get_pkg_slug_pool(session, "http://example.com/api", 1234, 100)) == sorted(_pkg_names[:50])
+
+
+def test_pkg_slug_pool_none_suitable():
+    session = _stub_session({"package_list": _pkg_names[50:]})
+    with pytest.raises(ValueError):
+        get_pkg_slug_pool(session, "http://example.com/api", 1234, 10)
+
+
+def _harvested_package_search(count):
+    "A package_search over ``count`` harvested packages"
+    def package_search(params):
+        start, rows = int(params.get("start", 0)), int(params["rows"])
+        return {
+            "count": count,
+            "results": [
+                {"extras": [{"key": "guid", "value": "x"}, {"key": "harvest_object_id", "value": f"ho-{i}"}]}
+                for i in range(start, min(count, start + rows))
+            ],
+        }
+    return package_search
+
+
+def test_harvestobject_id_pool():
+    session = _stub_session({"package_search": _harvested_package_search(10000)})
+    pool = get_harvestobject_id_pool(session, "http://example.com/api", 1234, 20)
+    assert len(pool) == len(set(pool)) == 20
+
+    # drawn from 4 pages of 5 at independent points in the range, rather than one run of 20
+    adapter = session.get_adapter("http://example.com")
+    starts = [int(dict(parse_qsl(urlsplit(url).query))["start"]) for url in adapter.requests[1:]]
+    assert len(starts) == 4
+    assert all(b - a >= 5 for a, b in zip(starts, starts[1:])), starts
+    assert max(starts) - min(starts) > 100
+
+    assert get_harvestobject_id_pool(session, "http://example.com/api", 1234, 20) == pool
+
+
+def test_harvestobject_id_pool_few():
+    session = _stub_session({"package_search": _harvested_package_search(3)})
+    assert sorted(get_harvestobject_id_pool(session, "http://example.com/api", 1234, 20)) == ["ho-0", "ho-1", "ho-2"]
+
+
+def test_harvestobject_id_pool_empty():
+    session = _stub_session({"package_search": _harvested_package_search(0)})
+    assert get_harvestobject_id_pool(session, "http://example.com/api", 1234, 20) == ()
+
+
+def test_test_random():
+    assert get_test_random(1234, "test_a").random() == get_test_random(1234, "test_a").random()
+    assert get_test_random(1234, "test_a").random() != get_test_random(1234, "test_b").random()
+    assert get_test_random(1234, "test_a").random() != get_test_random(4321, "test_a").random()
+
+
+_seed_test_module = """
+import json
+import os
+
+import pytest
+
+
+@pytest.mark.parametrize("n", range(4))
+def test_seeded(n, random_seed, seeded_random):
+    worker = os.environ.get("PYTEST_XDIST_WORKER", "main")
+    with open(f"out-{n}-{worker}.json", "w") as f:
+        json.dump([random_seed, seeded_random.random()], f)
+"""
+
+
+def _run_seed_tests(testdir, *args, variables=None):
+    testdir.makeconftest('pytest_plugins = ["ckanfunctionaltests.api.conftest"]')
+    testdir.makepyfile(test_seeded=_seed_test_module)
+    variables_path = testdir.tmpdir.join("variables.json")
+    variables_path.write(json.dumps({"api_user_agent": "ckan-functional-tests", **(variables or {})}))
+    for out_path in testdir.tmpdir.listdir("out-*.json"):
+        out_path.remove()
+
+    result = testdir.runpytest_subprocess("--variables", str(variables_path), *args)
+    assert result.ret == 0
+
+    return result, {
+        out_path.basename: tuple(json.loads(out_path.read()))
+        for out_path in testdir.tmpdir.listdir("out-*.json")
+    }
+
+
+@pytest.fixture()
+def seed_testdir(testdir, monkeypatch):
+    # the subprocess should import this copy of the package
+    package_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join(filter(None, (package_root, os.environ.get("PYTHONPATH")))))
+    return testdir
+
+
+def test_configured_seed_reproduces_choices(seed_testdir):
+    result, outputs = _run_seed_tests(seed_testdir, variables={"random_seed": 1234})
+    result.stdout.fnmatch_lines(["random seed: 1234"])
+    assert len(outputs) == 4
+    assert {seed for seed, _ in outputs.values()} == {1234}
+    # each test gets its own sequence of choices
+    assert len({value for _, value in outputs.values()}) == 4
+
+    _, rerun_outputs = _run_seed_tests(seed_testdir, variables={"random_seed": 1234})
+    assert rerun_outputs == outputs
+
+
+def test_generated_seed_reaches_workers(seed_testdir):
+    # with --dist each, every worker runs every test
+    result, outputs = _run_seed_tests(seed_testdir, "-n", "2", "--dist", "each")
+    assert len(outputs) == 8
+    (seed,) = {seed for seed, _ in outputs.values()}
+    result.stdout.fnmatch_lines([f"random seed: {seed}"])
+    # ...and makes the same choices for it
+    for n in range(4):
+        assert outputs[f"out-{n}-gw0.json"] == outputs[f"out-{n}-gw1.json"]
+
+    # which are those a run given that seed would make
+    _, rerun_outputs = _run_seed_tests(seed_testdir, variables={"random_seed": seed})
+    assert {name.replace("-main", "-gw0"): output for name, output in rerun_outputs.items()} == {
+        name: output for name, output in outputs.items() if name.endswith("-gw0.json")
+    }
@@ -0,0 +1,72 @@
+import jsonschema
+import pytest
+
+from ckanfunctionaltests.api import (
+    get_example_response,
+    validate_against_schema,
+)
+from ckanfunctionaltests.api.projection import package_search_projection, search_dataset_projection
+
+
+pytestmark = pytest.mark.usefixtures("validation_engine")
+
+
+def test_fl_param():
+    projection = package_search_projection("id", "name")
+    assert projection.fl_param() == "&fl=id,name"
+    assert projection.fl_param(False) == ""
+
+
+def test_only_projected_fields_enforced():
+    example_response = get_example_response("package_search.json")
+    for result in example_response["result"]["results"]:
+        del result["title"]
+        result["organization"] = "not an organization"
+
+    with pytest.raises(jsonschema.ValidationError):
+        validate_against_schema(example_response, "package_search")
+
+    projection = package_search_projection("id", "name")
+    projection.validate(example_response, "package_search")
+
+    example_response["result"]["results"][1]["id"] = "not-a-uuid"
+    with pytest.raises(jsonschema.ValidationError):
+        projection.validate(example_response, "package_search")
+
+
+def test_projected_field_required():
+    example_response = get_example_response("package_search.json")
+    del example_response["result"]["results"][0]["name"]
+
+    package_search_projection("id", "title").validate(example_response, "package_search")
+    with pytest.raises(jsonschema.ValidationError):
+        package_search_projection("id", "name").validate(example_response, "package_search")
+
+
+def test_envelope_still_enforced():
+    example_response = get_example_response("package_search.json")
+    del example_response["result"]["count"]
+
+    with pytest.raises(jsonschema.ValidationError):
+        package_search_projection("id").validate(example_response, "package_search")
+
+
+def test_project():
+    example_response = get_example_response("package_search.json")
+    projection = package_search_projection("id", "name")
+    assert projection.project(example_response) is example_response
+    assert example_response["result"]["results"]
+    assert all(result.keys() <= {"id", "name"} for result in example_response["result"]["results"])
+    assert "facets" in example_response["result"]
+
+
+@pytest.mark.parametrize("response_filename", (
+    "search_dataset.all_fields.json",
+    "search_dataset.rawids.json",
+))
+def test_search_dataset(response_filename):
+    example_response = get_example_response(response_filename)
+    projection = search_dataset_projection("id", "title")
+    projection.validate(example_response, "search_dataset")
+    projection.project(example_response)
+    projection.validate(example_response, "search_dataset")
@@ -0,0 +1,120 @@
+import os
+import os.path
+import shutil
+
+import pytest
+
+from ckanfunctionaltests.api import (
+    _get_formats,
+    _schema_id_base,
+    _schemas_dir,
+    fastjsonschema,
+    get_example_response,
+    schema_bundle,
+)
+
+
+_bundle_filename = ".schema-bundle.marshal"
+
+
+@pytest.fixture(scope="module")
+def _built_schemas_dir(tmp_path_factory):
+    "A copy of the schemas along with a freshly built bundle, which is slow enough to only want to do once"
+    schemas_dir = tmp_path_factory.mktemp("built") / "schemas"
+    shutil.copytree(_schemas_dir, schemas_dir, ignore=shutil.ignore_patterns(".*"))
+    _get_bundle(os.path.join(schemas_dir, _bundle_filename), str(schemas_dir))
+    return schemas_dir
+
+
+@pytest.fixture()
+def schemas_dir(tmp_path, _built_schemas_dir):
+    "A copy of the schemas with an already-built, fresh bundle"
+    schemas_dir = tmp_path / "schemas"
+    # copytree preserves mtimes, so the bundle remains fresh
+    shutil.copytree(_built_schemas_dir, schemas_dir)
+    return str(schemas_dir)
+
+
+@pytest.fixture()
+def bundle_path(schemas_dir):
+    return os.path.join(schemas_dir, _bundle_filename)
+
+
+def _get_bundle(bundle_path, schemas_dir):
+    return schema_bundle.get_bundle(bundle_path, schemas_dir, _schema_id_base, _get_formats())
+
+
+def _load_bundle(bundle_path, schemas_dir):
+    return schema_bundle.load_bundle(bundle_path, schemas_dir, _get_formats())
+
+
+def test_built_and_reloaded(bundle_path, schemas_dir):
+    assert _load_bundle(bundle_path, schemas_dir) is not None
+    os.unlink(bundle_path)
+    assert _load_bundle(bundle_path, schemas_dir) is None
+
+    bundle = _get_bundle(bundle_path, schemas_dir)
+    assert _schema_id_base + "package_show" in bundle["store"]
+    assert len(bundle["store"]) == len(schema_bundle.get_schema_paths(schemas_dir))
+
+    assert _load_bundle(bundle_path, schemas_dir) == bundle
+    assert not [name for name in os.listdir(schemas_dir) if name.startswith(".tmp")]
+
+
+def test_touched_schema_still_fresh(bundle_path, schemas_dir):
+    schema_path = os.path.join(schemas_dir, "common.schema.json")
+    stat = os.stat(schema_path)
+    os.utime(schema_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert _load_bundle(bundle_path, schemas_dir) is not None
+
+
+@pytest.mark.parametrize("change", ("modify", "add", "remove",))
+def test_stale(bundle_path, schemas_dir, change):
+    schema_path = os.path.join(schemas_dir, "i18n.schema.json")
+    if change == "modify":
+        with open(schema_path, "a") as f:
+            f.write("\n")
+    elif change == "add":
+        shutil.copy(schema_path, os.path.join(schemas_dir, "i18n_copy.schema.json"))
+    else:
+        os.unlink(schema_path)
+
+    assert _load_bundle(bundle_path, schemas_dir) is None
+    # a rebuilt bundle reflects the change and is itself fresh
+    rebuilt = _get_bundle(bundle_path, schemas_dir)
+    assert (_schema_id_base + "i18n_copy" in rebuilt["store"]) == (change == "add")
+    assert _load_bundle(bundle_path, schemas_dir) == rebuilt
+
+
+def test_corrupt(bundle_path, schemas_dir):
+    with open(bundle_path, "wb") as f:
+        f.write(b"\x00not a bundle")
+
+    assert _load_bundle(bundle_path, schemas_dir) is None
+    assert _get_bundle(bundle_path, schemas_dir)["store"]
+
+
+def test_default_bundle_path(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    bundle_path = schema_bundle.get_default_bundle_path(_schemas_dir)
+    assert bundle_path.startswith(os.path.join(str(tmp_path), "ckan-functional-tests", ""))
+    assert schema_bundle.get_default_bundle_path(_schemas_dir + "-elsewhere") != bundle_path
+
+    # the cache directory is created as needed
+    assert _get_bundle(bundle_path, _schemas_dir)["store"]
+    assert _load_bundle(bundle_path, _schemas_dir) is not None
+    assert not [name for name in os.listdir(_schemas_dir) if name.startswith(".")]
+
+
+@pytest.mark.skipif(fastjsonschema is None, reason="fastjsonschema not installed")
+def test_bundled_validator(bundle_path, schemas_dir):
+    func = schema_bundle.load_validator(_get_bundle(bundle_path, schemas_dir), "package_show")
+    example_response = get_example_response("package_show.json")
+    func(example_response, custom_formats=_get_formats())
+
+    example_response["result"]["id"] = "not-a-uuid"
+    with pytest.raises(fastjsonschema.JsonSchemaException):
+        func(example_response, custom_formats=_get_formats())
+
+    assert schema_bundle.load_validator(_get_bundle(bundle_path, schemas_dir), "no_such_schema") is None
@@ -4,7 +4,15 @@ import os.path
 import jsonschema
 import pytest
 
-from ckanfunctionaltests.api import validate_against_schema, get_example_response
+from ckanfunctionaltests.api import (
+    get_example_response,
+    validate_against_schema,
+    validate_many,
+)
+
+
+# every test here is run both with and without the compiled fast path
+pytestmark = pytest.mark.usefixtures("validation_engine")
 
 
 @pytest.mark.parametrize("response_filename,schema_name", (
@@ -163,3 +171,27 @@ def test_format_autocomplete_result_missing_format():
 def test_i18n_non_dict():
     with pytest.raises(jsonschema.ValidationError):
         validate_against_schema(3.1415, "i18n")
+
+
+def _get_embedded_packages(n):
+    results = get_example_response("search_dataset.all_fields.json")["results"]
+    packages = [json.loads(result["data_dict"]) for result in results if "data_dict" in result]
+    return [dict(packages[i % len(packages)]) for i in range(n)]
+
+
+def test_validate_many_valid():
+    assert validate_many(_get_embedded_packages(10), "package_base") == {}
+
+
+@pytest.mark.parametrize("processes,chunk_size", ((0, 100,), (2, 4,),), ids=("in_process", "process_pool",))
+def test_validate_many_aggregates_errors(processes, chunk_size):
+    packages = _get_embedded_packages(20)
+    packages[3]["id"] = "not-a-uuid"
+    packages[3]["state"] = 3
+    packages[17]["name"] = 5
+
+    errors = validate_many(packages, "package_base", processes=processes, chunk_size=chunk_size)
+
+    assert sorted(errors) == [3, 17]
+    assert {(error.index, error.path,) for error in errors[3]} == {(3, ("id",)), (3, ("state",))}
+    assert [(error.index, error.path,) for error in errors[17]] == [(17, ("name",))]
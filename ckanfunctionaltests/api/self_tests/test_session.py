@@ -0,0 +1,197 @@
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from threading import Barrier, Thread, get_ident
+
+import pytest
+from requests import Session
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+from ckanfunctionaltests.api.adapters import CachingAdapter, RateLimitedAdapter, build_response
+from ckanfunctionaltests.api.cassette import CassetteAdapter
+from ckanfunctionaltests.api.latency import LatencyRecorder, LatencyRecordingAdapter, TimedHTTPAdapter
+from ckanfunctionaltests.api.session import AsyncSession, get_result, make_adapter, run_concurrently
+
+
+class BarrierAdapter(BaseAdapter):
+    "Responds to a request only once ``parties`` requests are simultaneously in flight"
+    def __init__(self, parties):
+        super().__init__()
+        self.barrier = Barrier(parties, timeout=5)
+
+    def send(self, request, **kwargs):
+        self.barrier.wait()
+        return build_response(request, 200, "OK", {}, request.url.encode("utf-8"))
+
+    def close(self):
+        pass
+
+
+def test_requests_concurrent():
+    session = Session()
+    session.mount("http://", BarrierAdapter(3))
+    asession = AsyncSession(session, 3)
+    try:
+        responses = run_concurrently(*(
+            asession.get(f"http://example.com/{i}") for i in range(3)
+        ))
+    finally:
+        asession.close()
+
+    # results should be in the order requested
+    assert [response.text for response in responses] == [f"http://example.com/{i}" for i in range(3)]
+
+
+def test_requests_thread_sessions():
+    session = Session()
+    session.mount("http://", BarrierAdapter(2))
+    session.headers["x-thing"] = "1"
+    asession = AsyncSession(session, 2)
+    try:
+        # the test's session may be altered after creating the AsyncSession
+        session.auth = ("user", "pass",)
+        responses = run_concurrently(*(
+            asession.request("GET", f"http://example.com/{i}", hooks={
+                "response": lambda response, **kwargs: setattr(response, "thread", get_ident()),
+            })
+            for i in range(2)
+        ))
+    finally:
+        asession.close()
+
+    # each from a different thread, so necessarily through a different Session
+    assert len({response.thread for response in responses}) == 2
+    for response in responses:
+        assert response.request.headers["x-thing"] == "1"
+        assert response.request.headers["authorization"].startswith("Basic ")
+
+
+def test_return_exceptions():
+    async def fail():
+        raise ValueError("whatever")
+
+    async def succeed():
+        return 1
+
+    failed, succeeded = run_concurrently(fail(), succeed(), return_exceptions=True)
+    assert get_result(succeeded) == 1
+    with pytest.raises(ValueError):
+        get_result(failed)
+
+
+class _EchoHandler(BaseHTTPRequestHandler):
+    "Responds with the request's path and headers, once enough requests are in flight at once"
+    protocol_version = "HTTP/1.1"
+    barrier = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.barrier.wait()
+        body = json.dumps({"path": self.path, "headers": dict(self.headers)}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.send_header("set-cookie", f"path={self.path[1:]}")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture()
+def echo_server_url(max_concurrent_requests):
+    handler = type("Handler", (_EchoHandler,), {"barrier": Barrier(max_concurrent_requests, timeout=5)})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_arsession_concurrent(rsession, arsession, echo_server_url, max_concurrent_requests):
+    rsession.auth = ("user", "pass",)
+    n_requests = max_concurrent_requests * 2
+
+    # the server only responds once max_concurrent_requests are in flight together
+    responses = run_concurrently(*(
+        arsession.get(f"{echo_server_url}/{i}") for i in range(n_requests)
+    ))
+
+    for i, response in enumerate(responses):
+        assert response.status_code == 200
+        rj = response.json()
+        assert rj["path"] == f"/{i}"
+        assert rj["headers"]["user-agent"] == rsession.headers["user-agent"]
+        assert rj["headers"]["Authorization"].startswith("Basic ")
+        # cookies set by one response shouldn't have been sent with any other request
+        assert "Cookie" not in rj["headers"]
+
+    # nor leaked into the test's own session
+    assert not rsession.cookies
+
+
+def _get_chain(adapter):
+    "The types of ``adapter`` and each adapter it wraps, outermost first"
+    chain = [type(adapter)]
+    while hasattr(adapter, "inner"):
+        adapter = adapter.inner
+        chain.append(type(adapter))
+    return chain
+
+
+def _find_adapter(adapter, adapter_type):
+    while not isinstance(adapter, adapter_type):
+        adapter = adapter.inner
+    return adapter
+
+
+def test_make_adapter_minimal():
+    adapter = make_adapter({"rate_limit_per_second": 0, "cassette_mode": "off", "response_cache_size": 0}, Counter())
+    assert _get_chain(adapter) == [HTTPAdapter]
+    adapter.close()
+
+
+def test_make_adapter_order(tmp_path):
+    adapter = make_adapter(
+        {
+            "rate_limit_per_second": 10,
+            "cassette_mode": "record",
+            "cassette_dir": str(tmp_path),
+            "response_cache_size": 10,
+        },
+        Counter(),
+        LatencyRecorder(),
+    )
+    # cached and replayed responses should never count against the rate limit, and time spent
+    # waiting for the rate limit shouldn't count as latency
+    assert _get_chain(adapter) == [
+        CachingAdapter,
+        CassetteAdapter,
+        RateLimitedAdapter,
+        LatencyRecordingAdapter,
+        TimedHTTPAdapter,
+    ]
+    adapter.close()
+
+
+@pytest.mark.parametrize("worker_count,expected_waits", (
+    # a 10/s limit with bursts of 4 split between the workers
+    (None, [0.] * 4 + [.1]),
+    ("2", [0.] * 2 + [.2]),
+    # each worker should be allowed a burst of at least one
+    ("8", [0.] + [.8]),
+))
+def test_make_adapter_rate_split_between_workers(monkeypatch, worker_count, expected_waits):
+    if worker_count is None:
+        monkeypatch.delenv("PYTEST_XDIST_WORKER_COUNT", raising=False)
+    else:
+        monkeypatch.setenv("PYTEST_XDIST_WORKER_COUNT", worker_count)
+    # stop the bucket's clock so its refilling doesn't depend on how long this test takes
+    monkeypatch.setattr("ckanfunctionaltests.api.adapters.monotonic", lambda: 100.)
+    monkeypatch.setattr("ckanfunctionaltests.api.adapters.sleep", lambda seconds: None)
+
+    adapter = make_adapter({"rate_limit_per_second": 10, "rate_limit_burst": 4}, Counter())
+    bucket = _find_adapter(adapter, RateLimitedAdapter)._bucket
+    assert [round(bucket.acquire(), 6) for _ in expected_waits] == expected_waits
+    adapter.close()
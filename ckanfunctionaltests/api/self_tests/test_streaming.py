@@ -0,0 +1,114 @@
+import json
+
+import pytest
+from requests import Session
+from requests.adapters import BaseAdapter
+
+from ckanfunctionaltests.api import get_example_response
+from ckanfunctionaltests.api.adapters import build_response
+from ckanfunctionaltests.api.cassette import CassetteAdapter, CassetteStore
+from ckanfunctionaltests.api.streaming import JSONArrayStream
+
+
+def _chunked(document, chunk_size):
+    encoded = json.dumps(document, indent=1).encode("utf-8")
+    return [encoded[i:i+chunk_size] for i in range(0, len(encoded), chunk_size)]
+
+
+@pytest.mark.parametrize("chunk_size", (5, 61, 4096,))
+@pytest.mark.parametrize("response_filename,path", (
+    ("package_list.json", ("result",),),
+    ("package_search.json", ("result", "results",),),
+    ("search_dataset.all_fields.json", ("results",),),
+))
+def test_stream_items(chunk_size, response_filename, path):
+    document = get_example_response(response_filename)
+    stream = JSONArrayStream(_chunked(document, chunk_size), path)
+
+    expected_items = document
+    for key in path:
+        expected_parent, expected_items = expected_items, expected_items[key]
+
+    assert list(stream) == expected_items
+    assert stream.finished
+    assert stream.siblings == {k: v for k, v in expected_parent.items() if k != path[-1]}
+
+
+@pytest.mark.parametrize("chunk_size", (1, 3, 4096,))
+def test_stream_numbers_and_unicode(chunk_size):
+    document = {"a": 1, "result": [12345, -6.5e10, "café ☃", None, True, {"x": []}], "z": 98765}
+    stream = JSONArrayStream(_chunked(document, chunk_size), ("result",))
+
+    assert list(stream) == document["result"]
+    assert stream.siblings == {"a": 1, "z": 98765}
+
+
+def test_stream_empty_array():
+    stream = JSONArrayStream(_chunked({"result": []}, 2), ("result",))
+    assert list(stream) == []
+    assert stream.finished
+
+
+def test_stream_finished_with_final_item():
+    stream = JSONArrayStream(_chunked({"result": ["a", "b"], "count": 2}, 3), ("result",))
+    stream_iter = iter(stream)
+
+    assert next(stream_iter) == "a"
+    assert not stream.finished
+    assert next(stream_iter) == "b"
+    assert stream.finished
+    assert stream.siblings == {"count": 2}
+
+
+def test_stream_missing_key():
+    with pytest.raises(KeyError):
+        list(JSONArrayStream(_chunked({"a": {"b": []}, "c": 1}, 5), ("a", "c",)))
+
+
+def test_stream_truncated():
+    with pytest.raises(ValueError):
+        list(JSONArrayStream(_chunked({"result": [1, 2, 3]}, 5)[:-1], ("result",)))
+
+
+def test_stream_exhausts_chunks():
+    document = {"result": {"count": 2, "results": ["a", "b"], "facets": {"x": 1}}, "success": True}
+    chunks = _chunked(document, 3)
+    consumed = []
+
+    stream = JSONArrayStream((consumed.append(chunk) or chunk for chunk in chunks), ("result", "results",))
+    assert list(stream) == ["a", "b"]
+    # the closing of the enclosing object & its later members have been read too
+    assert consumed == chunks
+    assert stream.siblings == {"count": 2, "facets": {"x": 1}}
+
+
+class _DocumentAdapter(BaseAdapter):
+    "Responds to every request with ``document``"
+    def __init__(self, document):
+        super().__init__()
+        self.document = document
+
+    def send(self, request, **kwargs):
+        return build_response(
+            request,
+            200,
+            "OK",
+            {"content-type": "application/json"},
+            json.dumps(self.document).encode("utf-8"),
+        )
+
+    def close(self):
+        pass
+
+
+def test_stream_response_recorded_and_replayed(tmp_path):
+    document = get_example_response("package_search.json")
+    store = CassetteStore(str(tmp_path))
+
+    for mode in ("record", "replay",):
+        session = Session()
+        session.mount("http://", CassetteAdapter(_DocumentAdapter(document), store, mode))
+        response = session.get("http://example.com/api/action/package_search?q=x", stream=True)
+        stream = JSONArrayStream.from_response(response, ("result", "results",), chunk_size=64)
+        assert list(stream) == document["result"]["results"]
+        assert stream.siblings["count"] == document["result"]["count"]
@@ -0,0 +1,172 @@
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import os
+from threading import local
+from typing import Optional
+
+from requests import Response, Session
+from requests.adapters import BaseAdapter, HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ckanfunctionaltests.api.adapters import CachingAdapter, RateLimitedAdapter, TokenBucket
+from ckanfunctionaltests.api.cassette import CassetteAdapter, CassetteStore
+from ckanfunctionaltests.api.latency import LatencyRecorder, LatencyRecordingAdapter, TimedHTTPAdapter
+
+
+def _get_worker_count() -> int:
+    # set by pytest-xdist in each of its worker processes
+    return int(os.environ.get("PYTEST_XDIST_WORKER_COUNT", 1))
+
+
+def make_adapter(
+    variables,
+    stats: Counter,
+    latency_recorder: Optional[LatencyRecorder] = None,
+) -> BaseAdapter:
+    """
+    Construct a connection-pooling adapter, intended to be shared between all sessions for
+    the duration of a run so that connections (and their TLS handshakes) are reused. Transient
+    gateway errors are retried with an exponential backoff.
+
+    If ``rate_limit_per_second`` is set, requests will be throttled so that the run as a whole
+    doesn't exceed that rate, the allowance being split evenly between any parallel workers.
+
+    If ``cassette_mode`` is set to "record" or "replay", responses will be recorded to or
+    replayed from the directory ``cassette_dir``.
+
+    If ``response_cache_size`` is set, up to that many responses will be cached in memory and
+    reused for identical requests. Counts of cache hits & misses are accumulated in ``stats``.
+
+    If a ``latency_recorder`` is given, the timings of every request actually sent to the target
+    instance are recorded in it. Cached or replayed responses and time spent waiting for the rate
+    limit aren't included.
+    """
+    pool_size = int(variables.get("http_pool_size", 10))
+    adapter = (HTTPAdapter if latency_recorder is None else TimedHTTPAdapter)(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=Retry(
+            total=int(variables.get("http_retries", 3)),
+            backoff_factor=float(variables.get("http_retry_backoff", 0.5)),
+            status_forcelist=(502, 503,),
+            # let the final response through to the test rather than raising
+            raise_on_status=False,
+        ),
+    )
+
+    if latency_recorder is not None:
+        adapter = LatencyRecordingAdapter(adapter, latency_recorder)
+
+    rate_limit = float(variables.get("rate_limit_per_second") or 0)
+    if rate_limit > 0:
+        worker_count = _get_worker_count()
+        adapter = RateLimitedAdapter(adapter, TokenBucket(
+            rate_limit / worker_count,
+            max(1., float(variables.get("rate_limit_burst", 1)) / worker_count),
+        ))
+
+    cassette_mode = variables.get("cassette_mode") or "off"
+    if cassette_mode != "off":
+        adapter = CassetteAdapter(
+            adapter,
+            CassetteStore(variables.get("cassette_dir") or "cassettes"),
+            cassette_mode,
+        )
+
+    response_cache_size = int(variables.get("response_cache_size") or 0)
+    if response_cache_size > 0:
+        adapter = CachingAdapter(adapter, response_cache_size, stats)
+
+    return adapter
+
+
+def new_session(variables, adapter: BaseAdapter) -> Session:
+    """
+    Construct a fresh session using the shared ``adapter``. Being a separate Session instance,
+    the caller is free to alter its auth, headers etc. without affecting other users of the
+    adapter. Note the session should *not* be closed as doing so would close the shared adapter.
+    """
+    session = Session()
+    session.headers = {"user-agent": variables["api_user_agent"]}
+    for prefix in ("http://", "https://",):
+        session.mount(prefix, adapter)
+    return session
+
+
+class AsyncSession:
+    """
+    An awaitable interface to a ``requests`` ``session``, allowing a test to issue independent
+    requests together. Requests are performed in a pool of at most ``max_workers`` threads.
+
+    A Session isn't safe to share between threads (e.g. each response updates its cookie jar),
+    so each thread sends its requests through its own Session, mounting the same adapters as
+    ``session`` and taking its auth, headers etc. as they are at the time of the request. The
+    adapters themselves are safe to share, so the shared adapter's pooling, retries, rate
+    limiting, cassettes and caching all still apply. Cookies set by responses are not copied
+    back to ``session``.
+    """
+    _copied_attrs = (
+        "auth",
+        "cert",
+        "cookies",
+        "headers",
+        "max_redirects",
+        "params",
+        "proxies",
+        "trust_env",
+        "verify",
+    )
+
+    def __init__(self, session: Session, max_workers: int):
+        self.session = session
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._local = local()
+
+    def _get_thread_session(self) -> Session:
+        thread_session = getattr(self._local, "session", None)
+        if thread_session is None:
+            thread_session = self._local.session = Session()
+            for prefix, adapter in self.session.adapters.items():
+                thread_session.mount(prefix, adapter)
+
+        for attr in self._copied_attrs:
+            value = getattr(self.session, attr)
+            # the cookie jar, headers etc. all have their own copy methods
+            setattr(thread_session, attr, value.copy() if hasattr(value, "copy") else value)
+        return thread_session
+
+    def _request(self, method: str, url: str, **kwargs) -> Response:
+        return self._get_thread_session().request(method, url, **kwargs)
+
+    async def request(self, method: str, url: str, **kwargs) -> Response:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor,
+            partial(self._request, method, url, **kwargs),
+        )
+
+    async def get(self, url: str, **kwargs) -> Response:
+        return await self.request("GET", url, **kwargs)
+
+    def close(self):
+        # only the threads are ours to clean up - the session's adapter is shared
+        self._executor.shutdown(wait=True)
+
+
+def run_concurrently(*awaitables, return_exceptions: bool = False):
+    """
+    Run ``awaitables`` together to completion, returning their results in order. With
+    ``return_exceptions`` set, any exception raised by one is returned as its result rather than
+    raised, to be dealt with using ``get_result``.
+    """
+    async def gather():
+        return await asyncio.gather(*awaitables, return_exceptions=return_exceptions)
+    return asyncio.run(gather())
+
+
+def get_result(outcome):
+    "The result of an awaitable run with ``return_exceptions``, raising it if it was an exception"
+    if isinstance(outcome, BaseException):
+        raise outcome
+    return outcome
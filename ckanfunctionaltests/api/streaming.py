@@ -0,0 +1,154 @@
+import codecs
+import json
+import re
+from typing import Iterable, Sequence
+
+
+_whitespace_re = re.compile(r"[ \t\n\r]*")
+_decoder = json.JSONDecoder()
+_number_chars = frozenset("0123456789.eE+-")
+
+
+class _Buffer:
+    "Text incrementally decoded from an iterable of utf-8 byte chunks, consumed from the front"
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._utf8_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._exhausted = False
+        self.text = ""
+        self.pos = 0
+
+    def fill(self) -> bool:
+        "Append the next chunk, returning False if there are none left"
+        if self._exhausted:
+            return False
+        try:
+            new_text = self._utf8_decoder.decode(next(self._chunks))
+        except StopIteration:
+            self._exhausted = True
+            new_text = self._utf8_decoder.decode(b"", final=True)
+        # discard the text we've already consumed
+        self.text = self.text[self.pos:] + new_text
+        self.pos = 0
+        return True
+
+    def drain(self) -> None:
+        "Consume and discard any chunks left, so that their source is read to the end"
+        for _ in self._chunks:
+            pass
+        self._exhausted = True
+
+    def peek(self) -> str:
+        "Return the next non-whitespace character without consuming it"
+        while True:
+            self.pos = _whitespace_re.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                raise ValueError("Unexpected end of JSON document")
+
+    def expect(self, chars: str) -> str:
+        "Consume the next non-whitespace character, which should be one of ``chars``"
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f"Expected one of {chars!r}, found {char!r}")
+        self.pos += 1
+        return char
+
+    def decode_value(self):
+        "Consume and return the next complete JSON value"
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                # presumably the value is incomplete
+                if not self.fill():
+                    raise
+                continue
+            # a number ending at (or just before a partial exponent or fraction at) the end of
+            # the buffer may continue in the next chunk
+            if (
+                isinstance(value, (int, float,))
+                and not isinstance(value, bool)
+                and (end == len(self.text) or self.text[end] in _number_chars)
+                and self.fill()
+            ):
+                continue
+            self.pos = end
+            return value
+
+
+class JSONArrayStream:
+    """
+    Iterates over the items of an array nested (at ``path``) within objects in a JSON document
+    supplied as an iterable of byte ``chunks``, decoding a single item at a time so that the whole
+    document never has to be held in memory. e.g. for a CKAN action response, a ``path`` of
+    ``("result", "results",)`` would iterate through a package_search's results.
+
+    The other members of the object directly containing the array are collected in ``siblings``
+    as they are passed, those following the array only becoming available once ``finished``,
+    which becomes True as soon as the final item has been produced. By then the rest of the
+    document will also have been read, so that e.g. a response it came from is read to the end.
+    """
+    def __init__(self, chunks: Iterable[bytes], path: Sequence[str]):
+        self.path = tuple(path)
+        self.siblings = {}
+        self.finished = False
+        self._buffer = _Buffer(chunks)
+        self._iter = self._iter_items()
+
+    @classmethod
+    def from_response(cls, response, path: Sequence[str], chunk_size: int = 1 << 16):
+        "Construct from a ``requests`` response, which should have been requested with stream=True"
+        return cls(response.iter_content(chunk_size), path)
+
+    def __iter__(self):
+        return self._iter
+
+    def _iter_items(self):
+        buf = self._buffer
+
+        for depth, key in enumerate(self.path):
+            buf.expect("{")
+            is_last = depth == len(self.path) - 1
+            while True:
+                if buf.peek() == "}":
+                    raise KeyError(key)
+                current_key = buf.decode_value()
+                buf.expect(":")
+                if current_key == key:
+                    break
+                value = buf.decode_value()
+                if is_last:
+                    self.siblings[current_key] = value
+                if buf.expect(",}") == "}":
+                    raise KeyError(key)
+
+        buf.expect("[")
+        if buf.peek() == "]":
+            buf.expect("]")
+            self._finish()
+            return
+
+        while True:
+            item = buf.decode_value()
+            # look for the end of the array *before* producing the item so that we can
+            # already be finished when the final item is produced
+            if buf.expect(",]") == "]":
+                self._finish()
+                yield item
+                return
+            yield item
+
+    def _finish(self):
+        # collect any remaining siblings
+        buf = self._buffer
+        if self.path:
+            while buf.expect(",}") == ",":
+                current_key = buf.decode_value()
+                buf.expect(":")
+                self.siblings[current_key] = buf.decode_value()
+        # what remains should only be the closing of any enclosing objects & their other members
+        buf.drain()
+        self.finished = True
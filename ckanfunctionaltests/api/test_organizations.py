@@ -3,7 +3,7 @@ from warnings import warn
 
 
 from ckanfunctionaltests.api import validate_against_schema
-from ckanfunctionaltests.api.comparisons import AnySupersetOf
+from ckanfunctionaltests.api.comparisons import AnySupersetOf, AnySupersetOfPlan, find_matches
 from ckanfunctionaltests.api.conftest import clean_unstable_elements
 
 
@@ -112,7 +112,7 @@ def test_organization_show_stable_org(subtests, base_url_3, rsession, stable_org
         validate_against_schema(rj, "organization_show")
 
     with subtests.test("response equality"):
-        assert rj["result"] == AnySupersetOf(stable_org, recursive=True, seq_norm_order=True)
+        assert rj["result"] == AnySupersetOfPlan(stable_org, recursive=True, seq_norm_order=True)
 
 
 def test_organization_show_inc_datasets_stable_pkg(
@@ -143,4 +143,5 @@ def test_organization_show_inc_datasets_stable_pkg(
 
         with subtests.test("response equality"):
             clean_unstable_elements(stable_org_with_datasets["packages"][0])
-            assert stable_org_with_datasets["packages"][0] in desired_result
+            matches = find_matches(stable_org_with_datasets["packages"][0], desired_result)
+            assert matches.indices, "\n".join(matches.describe_near_misses())
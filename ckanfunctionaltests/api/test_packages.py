@@ -7,8 +7,10 @@ from ckanfunctionaltests.api import (
     get_example_response,
     validate_against_schema,
 )
-from ckanfunctionaltests.api.comparisons import AnySupersetOf
+from ckanfunctionaltests.api.comparisons import AnySupersetOf, AnySupersetOfPlan
 from ckanfunctionaltests.api.conftest import clean_unstable_elements
+from ckanfunctionaltests.api.projection import package_search_projection
+from ckanfunctionaltests.api.session import get_result, run_concurrently
 
 
 def test_package_list(base_url_3, rsession):
@@ -26,11 +28,19 @@ def test_package_show_404(base_url_3, rsession):
     assert response.json()["success"] is False
 
 
-def test_package_show(subtests, base_url_3, rsession, random_pkg_slug):
+def test_package_show(subtests, base_url_3, rsession, arsession, random_pkg_slug):
     response = rsession.get(f"{base_url_3}/action/package_show?id={random_pkg_slug}")
     assert response.status_code == 200
     rj = response.json()
 
+    # the follow-up lookups don't depend on each other so can be made together. any error making
+    # one is only raised in the subtest using it.
+    organization = rj["result"].get("organization")
+    lookups = [arsession.get(f"{base_url_3}/action/package_show?id={rj['result']['id']}")]
+    if organization:
+        lookups.append(arsession.get(f"{base_url_3}/action/organization_show?id={organization['id']}"))
+    uuid_response, *org_responses = run_concurrently(*lookups, return_exceptions=True)
+
     with subtests.test("response validity"):
         validate_against_schema(rj, "package_show")
         assert rj["success"] is True
@@ -39,16 +49,15 @@ def test_package_show(subtests, base_url_3, rsession, random_pkg_slug):
 
     with subtests.test("uuid lookup consistency"):
         # we should be able to look up this same package by its uuid and get an identical response
-        uuid_response = rsession.get(f"{base_url_3}/action/package_show?id={rj['result']['id']}")
+        uuid_response = get_result(uuid_response)
         assert uuid_response.status_code == 200
         assert uuid_response.json() == rj
 
     with subtests.test("organization consistency"):
-        org_response = rsession.get(
-            f"{base_url_3}/action/organization_show?id={rj['result']['organization']['id']}"
-        )
+        assert organization, f"Package {random_pkg_slug!r} has no organization"
+        org_response = get_result(org_responses[0])
         assert org_response.status_code == 200
-        assert org_response.json()["result"] == AnySupersetOf(rj['result']['organization'], recursive=True)
+        assert org_response.json()["result"] == AnySupersetOf(organization, recursive=True)
 
 
 def test_package_show_default_schema(base_url_3, rsession, stable_pkg):
@@ -77,7 +86,7 @@ def test_package_show_stable_pkg(subtests, base_url_3, rsession, stable_pkg):
     clean_unstable_elements(rj["result"])
     clean_unstable_elements(stable_pkg)
     with subtests.test("response equality"):
-        assert rj["result"] == AnySupersetOf(stable_pkg, recursive=True, seq_norm_order=True)
+        assert rj["result"] == AnySupersetOfPlan(stable_pkg, recursive=True, seq_norm_order=True)
 
 
 def test_package_show_stable_pkg_default_schema(
@@ -101,7 +110,7 @@ def test_package_show_stable_pkg_default_schema(
 
     with subtests.test("response equality"):
         assert rj["result"] == stable_pkg_default_schema
-        assert rj["result"] == AnySupersetOf(stable_pkg_default_schema, recursive=True, seq_norm_order=True)
+        assert rj["result"] == AnySupersetOfPlan(stable_pkg_default_schema, recursive=True, seq_norm_order=True)
 
 
 def test_package_search_by_full_slug_general_term(
@@ -110,21 +119,25 @@ def test_package_search_by_full_slug_general_term(
     base_url_3,
     rsession,
     stable_pkg_slug,
+    variables,
 ):
+    projection = package_search_projection("id", "name")
     response = rsession.get(
         f"{base_url_3}/action/package_search?q={stable_pkg_slug}&rows=100"
+        + projection.fl_param(variables.get("ckan_version") == "2.9")
     )
     assert response.status_code == 200
     rj = response.json()
 
     with subtests.test("response validity"):
-        validate_against_schema(rj, "package_search")
+        projection.validate(rj, "package_search")
+        projection.project(rj)
         assert rj["success"] is True
         assert len(rj["result"]["results"]) <= 100
 
     if inc_sync_sensitive:
         desired_result = tuple(
-            pkg for pkg in response.json()["result"]["results"] if pkg["name"] == stable_pkg_slug
+            pkg for pkg in rj["result"]["results"] if pkg["name"] == stable_pkg_slug
         )
         assert desired_result
         if len(desired_result) > 1:
@@ -231,18 +244,22 @@ def test_package_search_by_org_id_specific_field_and_title_general_term(
                 # TODO assert actual contents are approximately equal (exact equality is out
                 # the window)
 
-def test_package_search_facets(subtests, inc_sync_sensitive, base_url_3, rsession, random_pkg):
+def test_package_search_facets(subtests, inc_sync_sensitive, base_url_3, rsession, random_pkg, variables):
     notes_terms = extract_search_terms(random_pkg["notes"], 2)
 
+    # only the facets are of interest here
+    projection = package_search_projection("id")
     response = rsession.get(
         f"{base_url_3}/action/package_search?q={notes_terms}&rows=10"
         "&facet.field=[\"license_id\",\"organization\"]&facet.limit=-1"
+        + projection.fl_param(variables.get("ckan_version") == "2.9")
     )
     assert response.status_code == 200
     rj = response.json()
 
     with subtests.test("response validity"):
-        validate_against_schema(rj, "package_search")
+        projection.validate(rj, "package_search")
+        projection.project(rj)
         assert rj["success"] is True
         assert len(rj["result"]["results"]) <= 10
 
@@ -285,4 +302,4 @@ def test_package_search_stable_package(subtests, base_url_3, rsession, stable_pk
     clean_unstable_elements(stable_pkg)
 
     with subtests.test("desired result equality"):
-        assert desired_result[0] == AnySupersetOf(stable_pkg, recursive=True, seq_norm_order=True)
+        assert desired_result[0] == AnySupersetOfPlan(stable_pkg, recursive=True, seq_norm_order=True)
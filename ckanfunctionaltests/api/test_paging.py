@@ -1,26 +1,72 @@
-from itertools import count
+from itertools import chain, count, islice
 
 import pytest
 
+from ckanfunctionaltests.api.fingerprint import RollingFingerprint
+from ckanfunctionaltests.api.session import run_concurrently
+from ckanfunctionaltests.api.streaming import JSONArrayStream
 
+
+def _get_in(obj, path):
+    for key in path:
+        obj = obj[key]
+    return obj
+
+
+def _get_page_bounds(total):
+    """
+    Generates the (limit, offset) of each page needed to cover ``total`` results, increasing
+    the page size exponentially. this should allow us to perform meaningful tests for both
+    heavily populated and sparsely populated instances
+    """
+    offset = 0
+    for log_limit in count():
+        if offset >= total:
+            return
+        limit = int(10 ** log_limit)
+        yield limit, offset
+        offset += limit
+
+
+def _describe_difference(paged_fingerprint, full_fingerprint):
+    "Returns a dict describing the first item differing between the fingerprints, if any"
+    index = paged_fingerprint.first_difference(full_fingerprint)
+    if index is None:
+        return None
+    page = paged_fingerprint.page_of(index)
+    return {
+        "index": index,
+        "page": page and page[:2],
+        "paged_length": len(paged_fingerprint),
+        "full_length": len(full_fingerprint),
+    }
+
+
+@pytest.mark.no_response_cache
 @pytest.mark.parametrize("endpoint_path", (
     "/action/package_list?",
     "/action/organization_list?",
-    # currently too slow to work
-    #"/action/harvest_source_list?",
+    "/action/harvest_source_list?",
 ))
 def test_list_paging_equivalence(subtests, base_url_3, rsession, endpoint_path):
-    full_response = rsession.get(f"{base_url_3}{endpoint_path}")
+    # the full response is streamed and both it and the pages are reduced to fingerprints
+    # as we go, so that we never have to hold the full list in memory. the full response is
+    # folded in with the same page boundaries so the page containing any difference can be
+    # identified.
+    full_response = rsession.get(f"{base_url_3}{endpoint_path}", stream=True)
     assert full_response.status_code == 200
-    assert full_response.json()["success"] is True
+    full_results = JSONArrayStream.from_response(full_response, ("result",))
+    full_results_iter = iter(full_results)
 
-    accumulated_results = []
+    offset = 0
+    paged_fingerprint = RollingFingerprint()
+    full_fingerprint = RollingFingerprint()
     for log_limit in count():
         # increasing the page size exponentially should allow us to perform meaningful
         # tests for both heavily populated and sparsely populated instances
         limit = int(10 ** log_limit)
         response = rsession.get(
-            f"{base_url_3}{endpoint_path}&limit={limit}&offset={len(accumulated_results)}"
+            f"{base_url_3}{endpoint_path}&limit={limit}&offset={offset}"
         )
         assert response.status_code == 200
         rj = response.json()
@@ -33,55 +79,59 @@ def test_list_paging_equivalence(subtests, base_url_3, rsession, endpoint_path):
             # no limit should return an equal result
             with subtests.test("offset no limit"):
                 response_no_lim = rsession.get(
-                    f"{base_url_3}{endpoint_path}&offset={len(accumulated_results)}"
+                    f"{base_url_3}{endpoint_path}&offset={offset}"
                 )
                 assert response_no_lim.status_code == 200
                 assert rj == response_no_lim.json()
 
-        accumulated_results += rj["result"]
+        paged_fingerprint.update(rj["result"])
+        full_fingerprint.update(islice(full_results_iter, len(rj["result"])))
+
+        offset += len(rj["result"])
 
         if len(rj["result"]) < limit:
             # we've requested more results than exist
             break
 
+    # there should be nothing left in the full response, but fold in anything that is
+    full_fingerprint.update(full_results_iter)
+
     with subtests.test("accumulated results equal"):
-        assert accumulated_results == full_response.json()["result"]
+        assert _describe_difference(paged_fingerprint, full_fingerprint) is None
+        assert full_results.siblings["success"] is True
 
     with subtests.test("no results past end"):
         overrun_response = rsession.get(
-            f"{base_url_3}{endpoint_path}&limit={limit}&offset={len(accumulated_results)+10}"
+            f"{base_url_3}{endpoint_path}&limit={limit}&offset={offset+10}"
         )
         assert overrun_response.status_code == 200
         assert overrun_response.json()["success"] is True
         assert overrun_response.json()["result"] == []
 
 
-@pytest.mark.parametrize("endpoint_path,results_getter,count_getter,limit_param,offset_param", (
+@pytest.mark.no_response_cache
+@pytest.mark.parametrize("endpoint_path,result_path,limit_param,offset_param", (
     (
         "/action/package_search?q=data",
-        lambda r: r["result"]["results"],
-        lambda r: r["result"]["count"],
+        ("result",),
         "rows",
         "start",
     ),
     (
         "/3/action/package_search?q=data",
-        lambda r: r["result"]["results"],
-        lambda r: r["result"]["count"],
+        ("result",),
         "rows",
         "start",
     ),
     (
         "/search/dataset?q=data",
-        lambda r: r["results"],
-        lambda r: r["count"],
+        (),
         "limit",
         "offset",
     ),
     (
         "/3/search/dataset?q=data",
-        lambda r: r["results"],
-        lambda r: r["count"],
+        (),
         "rows",
         "start",
     ),
@@ -90,9 +140,9 @@ def test_search_paging_equivalence(
     subtests,
     base_url,
     rsession,
+    arsession,
     endpoint_path,
-    results_getter,
-    count_getter,
+    result_path,
     limit_param,
     offset_param,
     variables
@@ -103,51 +153,67 @@ def test_search_paging_equivalence(
             limit_param = "rows"
             offset_param = "start"
         if endpoint_path.startswith("/3/search/dataset"):
-            results_getter = lambda r: r["result"]["results"]
-            count_getter = lambda r: r["result"]["count"]
+            result_path = ("result",)
+
+    results_getter = lambda r: _get_in(r, result_path)["results"]
 
     # in these tests the "full" response is actually also limited to the approx
-    # max size the endpoints will tend to allow
+    # max size the endpoints will tend to allow. it is streamed and both it and the pages are
+    # reduced to fingerprints as we go.
     full_response_limit = 1000
-    full_response = rsession.get(f"{base_url}{endpoint_path}&{limit_param}={full_response_limit}")
+    full_response = rsession.get(
+        f"{base_url}{endpoint_path}&{limit_param}={full_response_limit}",
+        stream=True,
+    )
     assert full_response.status_code == 200
+    full_results = JSONArrayStream.from_response(full_response, result_path + ("results",))
+    full_results_iter = iter(full_results)
 
-    frj = full_response.json()
-    full_response_complete = count_getter(frj) <= full_response_limit
-    if not full_response_complete:
-        assert len(results_getter(frj)) == full_response_limit
+    def get_page_url(limit, offset):
+        return f"{base_url}{endpoint_path}&{limit_param}={limit}&{offset_param}={offset}"
 
-    accumulated_results = []
-    for log_limit in count():
-        # increasing the page size exponentially should allow us to perform meaningful
-        # tests for both heavily populated and sparsely populated instances
-        limit = int(10 ** log_limit)
-        response = rsession.get(
-            f"{base_url}{endpoint_path}&{limit_param}={limit}&{offset_param}={len(accumulated_results)}"
-        )
+    def get_page_rj(response):
         assert response.status_code == 200
-        rj = response.json()
-
+        return response.json()
+
+    # the first page tells us the total, after which all the other pages can be requested at
+    # once (arsession giving each of its threads its own session), then folded into the
+    # fingerprint in order
+    first_page_rj = get_page_rj(rsession.get(get_page_url(1, 0)))
+    assert 0 < len(results_getter(first_page_rj))
+    page_bounds = tuple(_get_page_bounds(
+        min(_get_in(first_page_rj, result_path)["count"], full_response_limit)
+    ))
+    page_responses = run_concurrently(*(arsession.get(get_page_url(*bounds)) for bounds in page_bounds[1:]))
+
+    paged_fingerprint = RollingFingerprint()
+    full_fingerprint = RollingFingerprint()
+    pages = chain((first_page_rj,), map(get_page_rj, page_responses))
+    for (limit, offset), rj in zip(page_bounds, pages):
         assert 0 < len(results_getter(rj)) <= limit
 
-        accumulated_results += results_getter(rj)
+        full_fingerprint.update(islice(full_results_iter, len(results_getter(rj))))
+        # results past the end of an incomplete full_response can't be compared
+        paged_fingerprint.update(results_getter(rj)[:max(0, len(full_fingerprint) - offset)])
 
-        if len(accumulated_results) >= len(results_getter(frj)):
-            if len(accumulated_results) > len(results_getter(frj)):
-                # this should only have been possible if we didn't actually have the
-                # complete results in full_response
-                assert not full_response_complete
-                # trim to full_response_limit
-                accumulated_results = accumulated_results[:full_response_limit]
+        if full_results.finished and len(full_fingerprint) - offset < len(results_getter(rj)):
+            # this should only have been possible if we didn't actually have the
+            # complete results in full_response
+            assert full_results.siblings["count"] > full_response_limit
 
-            break
+    # there should be nothing left in the full response, but fold in anything that is
+    full_fingerprint.update(full_results_iter)
+
+    full_count = full_results.siblings["count"]
+    if full_count > full_response_limit:
+        assert len(full_fingerprint) == full_response_limit
 
     with subtests.test("accumulated results equal"):
-        assert accumulated_results == results_getter(frj)
+        assert _describe_difference(paged_fingerprint, full_fingerprint) is None
 
     with subtests.test("no results past end"):
         overrun_response = rsession.get(
-            f"{base_url}{endpoint_path}&{limit_param}=10&{offset_param}={count_getter(frj)+10}"
+            f"{base_url}{endpoint_path}&{limit_param}=10&{offset_param}={full_count+10}"
         )
         assert overrun_response.status_code == 200
         assert results_getter(overrun_response.json()) == []